@@ -1,8 +1,9 @@
 # Run command `python -m bokeh serve --show kd-scatter-combo.py` in order to run the server.
 # If that doesn't work, try `bokeh serve --show kd-scatter-combo.py.py`.
 
+import os
+import sys
 import time
-from datetime import datetime, timedelta
 
 import numpy as np
 import pandas as pd
@@ -27,41 +28,19 @@ from bokeh.plotting import curdoc, figure, output_file
 from bokeh.transform import factor_cmap  # For factor-based color mapping
 from scipy.stats import gaussian_kde
 
-df_business = pd.read_csv("../data/cleaned_businessV2.csv")
-
-#--------------------------------------------------------------
-
-# Helper functions for aggregation
-
-def get_opening_float(time_interval):
-    opening_time = time_interval.split("-")
-    opening_hour, opening_minute = opening_time[0].split(":")
-    opening_time_float = float(opening_hour) + float(opening_minute) / 60.0
-    return opening_time_float
-
-def get_closing_float(time_interval):
-    opening_time = time_interval.split("-")
-    closing_hour, closing_minute = opening_time[1].split(":")
-    closing_time_float = float(closing_hour) + float(closing_minute) / 60.0
-    return closing_time_float
+# The opening-hour features are shared with the dashboard
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from hours import hours_features
 
-def get_open_duration_float(time_interval):
-    # Split the string into start and end times
-    start_time_str, end_time_str = time_interval.split('-')
-
-    # Convert the strings to datetime objects
-    start_time = datetime.strptime(start_time_str, "%H:%M")
-    end_time = datetime.strptime(end_time_str, "%H:%M")
-    
-    # Adjust for intervals that cross midnight
-    if end_time <= start_time:
-        end_time += timedelta(days=1)
-
-    # Calculate the difference in hours and return as a float
-    time_difference = end_time - start_time
+df_business = pd.read_csv("../data/cleaned_businessV2.csv")
 
-    hours = time_difference.total_seconds() / 3600
-    return abs(hours)
+# Opening hours, closing hours and durations per day as written by
+# preprocessing/secondary_preprocessing.py, or computed here with the same function
+hours_features_path = "../data/hours_features_Philadelphia.csv"
+if os.path.exists(hours_features_path):
+    df_hours_features = pd.read_csv(hours_features_path)
+else:
+    df_hours_features = hours_features(df_business)
 
 #---------------------------- Aggregate and Clean Data ----------------------------------
 
@@ -84,13 +63,13 @@ rating_groups = ["Rating 1-2", "Rating 2-3", "Rating 3-4", "Rating 4-5"]
 
 df_business["Rating_Group"] = pd.cut(df_business["stars"], bins=[1,2,3,4,5], labels=rating_groups)
 
+# Add the columns for our x-values ("<day>_Hour_Of_Opening_Float") and
+# y-values ("<day>_Open_Duration_Float")
+df_business = df_business.merge(df_hours_features, on="business_id", how="left")
+
 for day in weekdays:
     # Drop the columns where shops are closed
     df_business = df_business[df_business["hours_" + day] != "Closed"]
-    # Create columns for our x-values
-    df_business[day + "_Hour_Of_Opening_Float"] = df_business["hours_" + day ].apply(get_opening_float)
-    # Create columns for our y-values
-    df_business[day + "_Open_Duration_Float"] = df_business["hours_" + day].apply(get_open_duration_float)
 
 
 #-------------------------------Scatter Plot--------------------------------------
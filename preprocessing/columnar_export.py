@@ -0,0 +1,68 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Reuse the dashboard's helpers so the exported columns match what it computes itself
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from categories import process_categories
+from columnar import write_table
+from hex_binning import to_web_mercator
+
+# Keep in sync with the configuration in src/dash.py
+categories_of_interest = ['Burger', 'Chinese', 'Mexican', 'Italian', 'Thai']
+weekdays = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def compact_ids(df):
+    # Dense ids from data_cleaning fit in int32, Yelp's string ids are kept as they are
+    for column in ('business_id', 'review_id'):
+        if column in df and pd.api.types.is_integer_dtype(df[column]):
+            df[column] = df[column].astype(np.int32)
+    return df
+
+
+def export_business_table(csv_path, features_path):
+    """Writes a typed columnar copy of a business CSV, with category_of_interest and the hour features precomputed."""
+    df = pd.read_csv(csv_path)
+    df = df.dropna(subset=['address'])
+
+    # Same tagging as the dashboard, stored as a categorical
+    df = process_categories(df, categories_of_interest)
+
+    df['stars'] = df['stars'].astype(np.float32)
+    df = compact_ids(df)
+
+    # Minute-of-day opening and closing from secondary_preprocessing, -1 on closed days
+    minute_columns = [column for column in df if column.endswith(('_Minute_Of_Opening', '_Minute_Of_Closing'))]
+    df[minute_columns] = df[minute_columns].astype(np.int16)
+
+    # Opening-hour features from secondary_preprocessing, closed days are NaN
+    features = pd.read_csv(features_path)
+    feature_columns = features.columns.drop('business_id')
+    features[feature_columns] = features[feature_columns].astype(np.float32)
+    features = compact_ids(features)
+    df = df.merge(features, on='business_id', how='left')
+
+    # Web mercator coordinates for the map, so they are not projected on every load
+    df['x'], df['y'] = to_web_mercator(df['longitude'], df['latitude'])
+
+    write_table(df, csv_path)
+    print(f"Columnar business table written for {csv_path} with shape: {df.shape}")
+
+
+def export_review_table(csv_path):
+    """Writes a typed columnar copy of a crosslisted review CSV."""
+    df = pd.read_csv(csv_path, usecols=['review_id', 'business_id', 'stars', 'date'])
+    df['stars'] = df['stars'].astype(np.float32)
+    df['date'] = pd.to_datetime(df['date'])
+    df = compact_ids(df)
+
+    write_table(df, csv_path)
+    print(f"Columnar review table written for {csv_path} with shape: {df.shape}")
+
+
+if __name__ == '__main__':
+    for i in 'Tucson', 'Tampa':
+        export_business_table('cleaned_businessV2_' + i + '.csv', 'hours_features_' + i + '.csv')
+        export_review_table('crosslisted_reviews_' + i + '.csv')
@@ -1,90 +1,152 @@
 import json
+from record_writers import open_record_writer, read_records
+from id_tables import IdTable
+from ndjson_reader import scan_records
 
-def filter_businesses_by_city(city_name, outputname):
-    # Open the dataset and process line by line
-    data = []
-    with open('yelp_academic_dataset_business.json', encoding='utf-8') as f:
+# Reviews are only read for these fields, their text is skipped without being parsed
+review_fields = ['review_id', 'business_id', 'stars', 'date']
+
+def crosslisted_review(review, business_id, review_ids=None):
+    """Keeps the ids, stars and date of a review. With review_ids, the review gets the next dense id, recorded in that writer."""
+    review_id = review['review_id']
+    if review_ids is not None:
+        review_ids.write({'id': review_ids.count, 'review_id': review_id})
+        review_id = review_ids.count - 1
+    return {
+        'review_id': review_id,
+        'business_id': business_id,
+        'stars': review['stars'],
+        'date': review['date']
+    }
+
+def business_key(business, business_ids):
+    # Encoded ids come back as strings from CSV business files
+    return business['business_id'] if business_ids is None else int(business['business_id'])
+
+def filter_businesses_by_city(city_name, outputname, output_format=None):
+    # Open the dataset and process line by line, writing each match as soon as it is found
+    with open('yelp_academic_dataset_business.json', encoding='utf-8') as f, \
+            open_record_writer(outputname, output_format) as writer:
         for line in f:
             # Load each line as a separate JSON object
             business = json.loads(line)
             if business['city'] == city_name:
-                data.append(business)
+                writer.write(business)
 
-    # Save the filtered data into a new file
-    with open(outputname, 'w', encoding='utf-8') as outfile:
-        json.dump(data, outfile, ensure_ascii=False, indent=4)
+    # Print the number of businesses in the city
+    print(f"Number of businesses in {city_name}: {writer.count}")
 
-    # Print the number of businesses in Philadelphia
-    print(f"Number of businesses in {city_name}: {len(data)}")
-
-def filter_reviews(input_file, output_file):
+def filter_reviews(input_file, output_file, output_format=None):
     """Filters reviews to only include ids, stars, and date."""
-    filtered_reviews = []
 
     # Open the review dataset and process line by line
-    with open(input_file, encoding='utf-8') as f:
-        for line in f:
-            # Load each review as a JSON object
-            review = json.loads(line)
-            # Extract relevant fields
-            filtered_review = {
-                'review_id': review['review_id'],
-                'business_id': review['business_id'],
-                'stars': review['stars'],
-                'date': review['date']
-            }
-            filtered_reviews.append(filtered_review)
-    
-    # Save the filtered reviews into a new file
-    with open(output_file, 'w', encoding='utf-8') as outfile:
-        json.dump(filtered_reviews, outfile, ensure_ascii=False, indent=4)
-    
+    with open_record_writer(output_file, output_format) as writer:
+        for review in scan_records(input_file, review_fields):
+            # Write the relevant fields out right away
+            writer.write(review)
+
     # Print the number of filtered reviews
-    print(f"Number of reviews filtered: {len(filtered_reviews)}")
-
-def crosslist_reviews(business_file, review_file, output_file):
-    """Filters reviews to only include those whose business_id is in the filtered business list."""
-    
-    # Load filtered business data (assuming it's already been filtered and saved)
-    with open(business_file, encoding='utf-8') as f:
-        filtered_businesses = json.load(f)
-    
-    # Create a set of business_ids from the filtered businesses
-    business_ids = {business['business_id'] for business in filtered_businesses}
-    
-    crosslisted_reviews = []
+    print(f"Number of reviews filtered: {writer.count}")
+
+def crosslist_reviews(business_file, review_file, output_file, output_format=None,
+                      business_id_table=None, review_id_table=None):
+    """
+    Filters reviews to only include those whose business_id is in the filtered business list.
+    If the business file carries dense ids, business_id_table maps the review's business_id to them.
+    With review_id_table, reviews get dense ids too and that table is written alongside.
+    """
+    business_ids = IdTable.load(business_id_table, 'business_id') if business_id_table else None
+
+    # Create a set of business_ids from the filtered businesses (assuming they've already been filtered and saved)
+    filtered_ids = {business_key(business, business_ids) for business in read_records(business_file)}
+
+    review_ids = open_record_writer(review_id_table) if review_id_table else None
+    try:
+        # Open the review dataset and process line by line
+        with open_record_writer(output_file, output_format) as writer:
+            for review in scan_records(review_file, review_fields):
+                business_id = review['business_id'] if business_ids is None else business_ids.get(review['business_id'])
+                # Check if the business_id in the review is in the set of filtered business_ids
+                if business_id in filtered_ids:
+                    writer.write(crosslisted_review(review, business_id, review_ids))
+    finally:
+        if review_ids is not None:
+            review_ids.close()
 
-    # Open the review dataset and process line by line
-    with open(review_file, encoding='utf-8') as f:
-        for line in f:
-            # Load each review as a JSON object
-            review = json.loads(line)
-            # Check if the business_id in the review is in the set of filtered business_ids
-            if review['business_id'] in business_ids:
-                crosslisted_review = {
-                    'review_id': review['review_id'],
-                    'business_id': review['business_id'],
-                    'stars': review['stars'],
-                    'date': review['date']
-                }
-                crosslisted_reviews.append(crosslisted_review)
-    
-    # Save the crosslisted reviews into a new file
-    with open(output_file, 'w', encoding='utf-8') as outfile:
-        json.dump(crosslisted_reviews, outfile, ensure_ascii=False, indent=4)
-    
     # Print the number of crosslisted reviews
-    print(f"Number of crosslisted reviews: {len(crosslisted_reviews)}")
-    
+    print(f"Number of crosslisted reviews: {writer.count}")
+
+def filter_businesses_by_cities(cities, outputnames, output_format=None, id_table=None):
+    """
+    Filters businesses for several cities in a single pass over the business dataset.
+    With id_table, business_id is replaced by a dense integer id, and the lookup table
+    back to Yelp's ids is saved to that file.
+    """
+    business_ids = IdTable('business_id') if id_table else None
+    writers = {city: open_record_writer(outputnames[city], output_format) for city in cities}
+    try:
+        with open('yelp_academic_dataset_business.json', encoding='utf-8') as f:
+            for line in f:
+                business = json.loads(line)
+                writer = writers.get(business['city'])
+                if writer is not None:
+                    if business_ids is not None:
+                        business['business_id'] = business_ids.encode(business['business_id'])
+                    writer.write(business)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    if business_ids is not None:
+        business_ids.save(id_table)
+
+    for city in cities:
+        print(f"Number of businesses in {city}: {writers[city].count}")
+
+def split_reviews_by_city(business_files, review_file, output_files, output_format=None,
+                          business_id_table=None, review_id_table=None):
+    """
+    Sends every review to the crosslisted file of its business's city, reading the review dataset only once.
+    The id tables work as in crosslist_reviews, review ids are dense across all cities.
+    """
+    business_ids = IdTable.load(business_id_table, 'business_id') if business_id_table else None
+
+    # Map each business_id to the city whose filtered business file contains it
+    city_of_business = {}
+    for city, business_file in business_files.items():
+        for business in read_records(business_file):
+            city_of_business[business_key(business, business_ids)] = city
+
+    review_ids = open_record_writer(review_id_table) if review_id_table else None
+    writers = {city: open_record_writer(output_files[city], output_format) for city in business_files}
+    try:
+        # Single pass over the review dataset, routing each review by its business_id
+        for review in scan_records(review_file, review_fields):
+            business_id = review['business_id'] if business_ids is None else business_ids.get(review['business_id'])
+            city = city_of_business.get(business_id)
+            if city is not None:
+                writers[city].write(crosslisted_review(review, business_id, review_ids))
+    finally:
+        for writer in writers.values():
+            writer.close()
+        if review_ids is not None:
+            review_ids.close()
+
+    for city, writer in writers.items():
+        print(f"Number of crosslisted reviews in {city}: {writer.count}")
+
 # For one city Philadelphia
 # filter_businesses_by_city('Philadelphia', 'cleaned_business_Philadelphia.json')
 # filter_reviews('yelp_academic_dataset_review.json', 'cleaned_reviews_Philadelphia.json')
 # crosslist_reviews('cleaned_business_Philadelphia.json', 'yelp_academic_dataset_review.json', 'crosslisted_reviews_Philadelphia.json')
 
-filter_businesses_by_city('Tucson', 'cleaned_business_Tucson.json')
-filter_reviews('yelp_academic_dataset_review.json', 'cleaned_reviews_Tucson.json')
-crosslist_reviews('cleaned_business_Tucson.json', 'yelp_academic_dataset_review.json', 'crosslisted_reviews_Tucson.json')
+# All cities are split with one pass over the business file and one pass over the review file
+cities = ['Tucson', 'Tampa']
 
-filter_businesses_by_city('Tampa', 'cleaned_business_Tampa.json')
-filter_reviews('yelp_academic_dataset_review.json', 'cleaned_reviews_Tampa.json')
-crosslist_reviews('cleaned_business_Tampa.json', 'yelp_academic_dataset_review.json', 'crosslisted_reviews_Tampa.json')
\ No newline at end of file
+if __name__ == '__main__':
+    business_files = {city: 'cleaned_business_' + city + '.json' for city in cities}
+    # Businesses and reviews get dense integer ids, the lookup tables keep Yelp's ids
+    filter_businesses_by_cities(cities, business_files, id_table='business_ids.csv')
+    # Reviews are streamed to NDJSON, one record per line, so memory use stays flat
+    split_reviews_by_city(business_files, 'yelp_academic_dataset_review.json',
+                          {city: 'crosslisted_reviews_' + city + '.ndjson' for city in cities},
+                          business_id_table='business_ids.csv', review_id_table='review_ids.csv')
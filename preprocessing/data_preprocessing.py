@@ -1,10 +1,148 @@
 import pandas as pd
 import numpy as np
 import json
+from functools import cached_property
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.impute import SimpleImputer
 from sklearn.utils import resample
+from ndjson_reader import iter_ndjson_chunks, read_ndjson_columns
+from data_profiling import row_digests, csv_dtypes, profile_csv, profile_ndjson, write_sketch_report
+
+# Keys of the nested objects of the Yelp business records, flattened into '<field>_<key>'
+# columns while the NDJSON is parsed
+NESTED_SCHEMA = {
+    'hours': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+    'attributes': [
+        'AcceptsInsurance', 'AgesAllowed', 'Alcohol', 'Ambience', 'BYOB', 'BYOBCorkage', 'BestNights',
+        'BikeParking', 'BusinessAcceptsBitcoin', 'BusinessAcceptsCreditCards', 'BusinessParking',
+        'ByAppointmentOnly', 'Caters', 'CoatCheck', 'Corkage', 'DietaryRestrictions', 'DogsAllowed',
+        'DriveThru', 'GoodForDancing', 'GoodForKids', 'GoodForMeal', 'HairSpecializesIn', 'HappyHour',
+        'HasTV', 'Music', 'NoiseLevel', 'Open24Hours', 'OutdoorSeating', 'RestaurantsAttire',
+        'RestaurantsCounterService', 'RestaurantsDelivery', 'RestaurantsGoodForGroups',
+        'RestaurantsPriceRange2', 'RestaurantsReservations', 'RestaurantsTableService',
+        'RestaurantsTakeOut', 'Smoking', 'WheelchairAccessible', 'WiFi',
+    ],
+}
+
+def holds_dictionaries(values):
+    # Only object columns can hold dictionaries, and NDJSON input is already flattened
+    return values.dtype == object and any(isinstance(x, dict) for x in values.to_numpy())
+
+def expand_dictionary_columns(data):
+    """
+    Expand the columns holding dictionaries into one column per key, prefixed with the column name.
+    Returns the new frame and the names of the expanded columns.
+    """
+    normalized = []
+    for column in data.columns:
+        if holds_dictionaries(data[column]):
+            expanded_cols = pd.json_normalize(data[column])
+            expanded_cols = expanded_cols.add_prefix(f'{column}_')
+            # json_normalize numbers its rows from 0, which only lines up with the first chunk of a file
+            expanded_cols.index = data.index
+            data = pd.concat([data.drop(columns=column), expanded_cols], axis=1)
+            normalized.append(column)
+    return data, normalized
+
+class DataProfile:
+    """
+    Summary statistics of a frame, each computed once on first use and then shared by the
+    quality tests, the report and the cleaning steps instead of rescanning the data for each.
+    """
+    def __init__(self, data):
+        self.data = data
+
+    @cached_property
+    def null_mask(self):
+        return self.data.isnull()
+
+    @cached_property
+    def missing(self):
+        return self.null_mask.sum()
+
+    @cached_property
+    def duplicated(self):
+        return self.data.duplicated().to_numpy()
+
+    @cached_property
+    def summary(self):
+        return self.data.describe()
+
+    @cached_property
+    def ranges(self):
+        """(column, min, max) of the numeric columns, taken from the summary statistics for float columns."""
+        ranges = []
+        for col in self.data.select_dtypes(include=[np.number]):
+            # describe gives floats, which cannot hold every integer, so integer columns are scanned
+            if pd.api.types.is_float_dtype(self.data[col]) and col in self.summary.columns and 'min' in self.summary.index:
+                ranges.append((col, self.summary.at['min', col], self.summary.at['max', col]))
+            else:
+                ranges.append((col, self.data[col].min(), self.data[col].max()))
+        return ranges
+
+    def rows(self, keep):
+        # Only valid for keep masks that drop whole groups of equal rows or only their repeats,
+        # otherwise the duplicate mask of the remaining rows would change
+        profile = DataProfile(self.data[keep])
+        for mask in ('null_mask', 'duplicated'):
+            if mask in self.__dict__:
+                setattr(profile, mask, self.__dict__[mask][keep])
+        return profile
+
+    def drop_missing(self):
+        # Equal rows are either all complete or all incomplete
+        return self.rows(~self.null_mask.any(axis=1).to_numpy())
+
+    def drop_duplicates(self):
+        return self.rows(~self.duplicated)
+
+def plot_missingness(profile):
+    plt.figure(figsize=(12, 8))
+    sns.heatmap(profile.null_mask, cbar=False, cmap='viridis')
+    plt.title("Missing Values Heatmap")
+    plt.show()
+
+def print_quality_tests(profile):
+    print("Summary statistics:")
+    print(profile.summary)
+    print("\nMissing values per column:")
+    print(profile.missing)
+    
+    print("\nChecking for inconsistencies...")
+    if profile.duplicated.sum() > 0:
+        print("Warning: There are duplicate rows in the dataset.")
+    else:
+        print("No duplicate rows detected.")
+    
+    for col, low, high in profile.ranges:
+        print(f"Checking range of {col}: {low} to {high}")
+
+def write_profile_report(profile, report_path):
+    with open(report_path, 'w') as report_file:
+        report_file.write(f"Data Cleaning Report\n")
+        report_file.write(f"{'='*40}\n")
+        report_file.write(f"Dataset shape: {profile.data.shape}\n\n")
+        
+        # Summary statistics
+        report_file.write("Summary Statistics:\n")
+        report_file.write(f"{profile.summary}\n\n")
+        
+        # Missing values
+        report_file.write("Missing Values per Column:\n")
+        report_file.write(f"{profile.missing}\n\n")
+        
+        # Duplicate check
+        duplicates = profile.duplicated.sum()
+        report_file.write(f"Duplicate rows: {duplicates}\n\n")
+        
+        # Column ranges
+        report_file.write("Numeric Column Ranges:\n")
+        for col, low, high in profile.ranges:
+            report_file.write(f"{col}: {low} to {high}\n")
+        
+        report_file.write("\nReport complete.\n")
+    print(f"Report written to {report_path}")
 
 class DataCleaning:
     def __init__(self, file_path, file_type='csv'):
@@ -15,8 +153,11 @@ class DataCleaning:
             self.data = pd.read_csv(file_path)
         elif file_type == 'json':
             self.data = self.json_to_dataframe(file_path)
+        elif file_type == 'ndjson':
+            # Parsed in parallel chunks straight into columns, with 'hours' and 'attributes' flattened
+            self.data = pd.DataFrame(read_ndjson_columns(file_path, nested=NESTED_SCHEMA))
         else:
-            raise ValueError("Unsupported file type. Use 'csv' or 'json'.")
+            raise ValueError("Unsupported file type. Use 'csv', 'json' or 'ndjson'.")
         
         print(f"Loaded dataset with shape: {self.data.shape}")
 
@@ -48,13 +189,9 @@ class DataCleaning:
         """
         Normalize and expand dictionary columns like 'attributes' and 'hours'.
         """
-        for column in self.data.columns:
-            if self.data[column].apply(lambda x: isinstance(x, dict)).sum() > 0:
-                print(f"Normalizing column: {column}")
-                expanded_cols = pd.json_normalize(self.data[column])
-                expanded_cols = expanded_cols.add_prefix(f'{column}_')
-                self.data.drop(column, axis=1, inplace=True)
-                self.data = pd.concat([self.data, expanded_cols], axis=1)
+        self.data, normalized = expand_dictionary_columns(self.data)
+        for column in normalized:
+            print(f"Normalizing column: {column}")
         
         print(f"Data shape after normalizing dictionary columns: {self.data.shape}")
 
@@ -65,10 +202,7 @@ class DataCleaning:
         """
         if data is None:
             data = self.data
-        plt.figure(figsize=(12, 8))
-        sns.heatmap(data.isnull(), cbar=False, cmap='viridis')
-        plt.title("Missing Values Heatmap")
-        plt.show()
+        plot_missingness(DataProfile(data))
 
     def data_quality_tests(self, data=None):
         """
@@ -77,19 +211,7 @@ class DataCleaning:
         """
         if data is None:
             data = self.data
-        print("Summary statistics:")
-        print(data.describe())
-        print("\nMissing values per column:")
-        print(data.isnull().sum())
-        
-        print("\nChecking for inconsistencies...")
-        if data.duplicated().sum() > 0:
-            print("Warning: There are duplicate rows in the dataset.")
-        else:
-            print("No duplicate rows detected.")
-        
-        for col in data.select_dtypes(include=[np.number]):
-            print(f"Checking range of {col}: {data[col].min()} to {data[col].max()}")
+        print_quality_tests(DataProfile(data))
     
     def handle_missing_values(self, strategy='mean', data=None):
         """
@@ -161,52 +283,245 @@ class DataCleaning:
         """
         Write a summary report of the data cleaning process to a text file.
         """
-        with open(report_path, 'w') as report_file:
-            report_file.write(f"Data Cleaning Report\n")
-            report_file.write(f"{'='*40}\n")
-            report_file.write(f"Dataset shape: {self.data.shape}\n\n")
-            
-            # Summary statistics
-            report_file.write("Summary Statistics:\n")
-            report_file.write(f"{self.data.describe()}\n\n")
-            
-            # Missing values
-            report_file.write("Missing Values per Column:\n")
-            report_file.write(f"{self.data.isnull().sum()}\n\n")
-            
-            # Duplicate check
-            duplicates = self.data.duplicated().sum()
-            report_file.write(f"Duplicate rows: {duplicates}\n\n")
-            
-            # Column ranges
-            report_file.write("Numeric Column Ranges:\n")
-            for col in self.data.select_dtypes(include=[np.number]):
-                report_file.write(f"{col}: {self.data[col].min()} to {self.data[col].max()}\n")
-            
-            report_file.write("\nReport complete.\n")
-        print(f"Report written to {report_path}")
+        write_profile_report(DataProfile(self.data), report_path)
+
+    def lazy(self):
+        """
+        Start a LazyDataCleaning plan on the loaded dataset.
+        """
+        return LazyDataCleaning(self)
+
+class LazyDataCleaning:
+    """
+    Lazy counterpart of the DataCleaning methods. Calls only record the steps and return the
+    plan, so they can be chained, and collect() runs them. The steps share one DataProfile of
+    the current data, so the missingness plot, the quality tests, dropping missing values and
+    duplicates, and the report reuse the same null and duplicate masks and summary statistics
+    until a step changes the data.
+    """
+    def __init__(self, cleaner):
+        self.cleaner = cleaner
+        self.steps = []
+
+    def then(self, step):
+        self.steps.append(step)
+        return self
+
+    def inspect(self, action):
+        # A step that only looks at the data
+        def step(profile):
+            action(profile)
+            return profile
+        return self.then(step)
+
+    def save_as_csv(self, output_path='output.csv'):
+        def save(profile):
+            profile.data.to_csv(output_path, index=False)
+            print(f"Data saved to {output_path}")
+        return self.inspect(save)
+
+    def normalize_dictionary_columns(self):
+        def normalize(profile):
+            data, normalized = expand_dictionary_columns(profile.data)
+            for column in normalized:
+                print(f"Normalizing column: {column}")
+            print(f"Data shape after normalizing dictionary columns: {data.shape}")
+            return DataProfile(data) if normalized else profile
+        return self.then(normalize)
+
+    def visualize_missingness(self):
+        return self.inspect(plot_missingness)
+
+    def data_quality_tests(self):
+        return self.inspect(print_quality_tests)
+
+    def handle_missing_values(self, strategy='mean'):
+        def handle(profile):
+            if strategy != 'drop':
+                data = profile.data.copy()
+                self.cleaner.handle_missing_values(strategy=strategy, data=data)
+                return DataProfile(data)
+            cleaned = profile.drop_missing()
+            print(f"Removed {len(profile.data) - len(cleaned.data)} rows with missing values.")
+            return cleaned
+        return self.then(handle)
+
+    def remove_duplicates(self):
+        def remove(profile):
+            cleaned = profile.drop_duplicates()
+            print(f"Removed {len(profile.data) - len(cleaned.data)} duplicate rows.")
+            return cleaned
+        return self.then(remove)
+
+    def analyze_data_points(self):
+        return self.inspect(lambda profile: self.cleaner.analyze_data_points(data=profile.data))
+
+    def save_cleaned_data(self, output_path='cleaned_data.csv'):
+        return self.inspect(lambda profile: self.cleaner.save_cleaned_data(output_path, data=profile.data))
+
+    def write_report(self, report_path='data_cleaning_report.txt'):
+        return self.inspect(lambda profile: write_profile_report(profile, report_path))
+
+    def collect(self):
+        """
+        Run the recorded steps, store the result as the cleaner's dataset and return it.
+        """
+        profile = DataProfile(self.cleaner.data)
+        for step in self.steps:
+            profile = step(profile)
+        self.cleaner.data = profile.data
+        return self.cleaner.data
+
+class ChunkedDataCleaning:
+    """
+    Out-of-core counterpart of DataCleaning for files bigger than memory. The cleaning steps
+    are recorded in the order they are called, then save_cleaned_data streams the file through
+    them in chunks of chunk_size rows and appends each cleaned chunk to the output. Every chunk
+    gets the columns of the whole file first, so the steps see the columns DataCleaning would.
+    """
+    def __init__(self, file_path, file_type='csv', chunk_size=100000):
+        if file_type not in ('csv', 'ndjson'):
+            raise ValueError("Unsupported file type for chunked cleaning. Use 'csv' or 'ndjson'.")
+        self.file_path = file_path
+        self.file_type = file_type
+        self.chunk_size = chunk_size
+        self.steps = []
+        self.columns = None
+        self.normalized_columns = None
+        self.dtypes = None
+
+    def chunks(self):
+        """
+        Read the dataset chunk by chunk.
+        """
+        if self.file_type == 'csv':
+            return pd.read_csv(self.file_path, chunksize=self.chunk_size, dtype=self.dtypes)
+        return (pd.DataFrame(data) for data in iter_ndjson_chunks(self.file_path, self.chunk_size, nested=NESTED_SCHEMA))
+
+    def read_schema(self):
+        """
+        Find the columns of the whole dataset, before and after normalizing, in a first pass
+        over it. A CSV has the columns of its header, read with the types of csv_dtypes so that
+        equal rows are equal in every chunk. NDJSON records have every key of any record, except
+        declared nested keys that no record has, in the order of DataCleaning.
+        """
+        if self.file_type == 'csv':
+            self.dtypes = csv_dtypes(self.file_path, self.chunk_size)
+            # CSV cells are never dictionaries
+            self.columns = self.normalized_columns = list(pd.read_csv(self.file_path, nrows=0).columns)
+            return
+        declared = {field + '_' + key for field, keys in NESTED_SCHEMA.items() for key in keys}
+        flattened_prefixes = tuple(field + '_' for field in NESTED_SCHEMA)
+        columns = {}
+        keys = {}
+        for chunk in self.chunks():
+            for column in chunk.columns:
+                if column in declared and not chunk[column].notna().any():
+                    continue
+                columns[column] = None
+                if holds_dictionaries(chunk[column]):
+                    keys.setdefault(column, {}).update(dict.fromkeys(pd.json_normalize(chunk[column]).columns))
+        # Flattened columns come after the others, like when the file is parsed at once
+        self.columns = sorted(columns, key=lambda column: column.startswith(flattened_prefixes))
+        self.normalized_columns = [column for column in self.columns if column not in keys]
+        self.normalized_columns += [column + '_' + key for column in self.columns if column in keys for key in keys[column]]
+
+    def normalize_dictionary_columns(self):
+        """
+        Normalize and expand dictionary columns like 'attributes' and 'hours' in every chunk.
+        Chunks get the expanded columns of the whole dataset, also for keys they do not have.
+        """
+        self.steps.append(lambda chunk: expand_dictionary_columns(chunk)[0].reindex(columns=self.normalized_columns))
+
+    def handle_missing_values(self, strategy='drop'):
+        """
+        Drop rows with missing values. Imputation needs statistics of the whole dataset and is not supported.
+        """
+        if strategy != 'drop':
+            raise ValueError("Chunked cleaning only supports strategy='drop'.")
+        self.steps.append(lambda chunk: chunk.dropna())
+
+    def remove_duplicates(self):
+        """
+        Remove duplicate rows across all chunks, keeping the first one. Only a 64-bit digest
+        of every row seen so far is kept in memory.
+        """
+        seen = set()
+
+        def drop_seen(chunk):
+            digests = row_digests(chunk)
+            # First occurrence within the chunk and not seen in an earlier one
+            keep = ~pd.Series(digests).duplicated().to_numpy()
+            keep &= np.fromiter((digest not in seen for digest in digests.tolist()), dtype=bool, count=len(digests))
+            seen.update(digests[keep].tolist())
+            return chunk[keep]
+
+        self.steps.append(drop_seen)
+
+    def write_report(self, report_path='data_cleaning_report.txt'):
+        """
+        Write a report of the input file from mergeable sketches built in one pass over its
+        chunks, in parallel for NDJSON. Quantiles and distinct counts are approximate.
+        """
+        if self.file_type == 'ndjson':
+            sketch = profile_ndjson(self.file_path)
+        else:
+            if self.columns is None:
+                self.read_schema()
+            sketch = profile_csv(self.file_path, chunk_size=self.chunk_size, dtypes=self.dtypes)
+        write_sketch_report(sketch, report_path)
+
+    def save_cleaned_data(self, output_path='cleaned_data.csv'):
+        """
+        Run the recorded steps over the dataset chunk by chunk and write the result incrementally.
+        """
+        if self.columns is None:
+            self.read_schema()
+        rows_read = rows_written = 0
+        for i, chunk in enumerate(self.chunks()):
+            rows_read += len(chunk)
+            # Columns the chunk does not have are missing in all its rows
+            chunk = chunk.reindex(columns=self.columns)
+            for step in self.steps:
+                chunk = step(chunk)
+            chunk.to_csv(output_path, mode='a' if i else 'w', header=not i, index=False)
+            rows_written += len(chunk)
+
+        print(f"Cleaned {rows_read} rows into {rows_written} rows, saved to {output_path}")
 
 # Example usage:
-cities = ['Tucson', 'Tampa']
-for i in cities:
-    cleaner = DataCleaning('crosslisted_reviews_' + i + '.json', file_type='json')
-    cleaner.normalize_dictionary_columns()  # Normalize dictionary columns like 'attributes' and 'hours'
-    cleaner.save_as_csv('crosslisted_reviews_' + i + '.csv')  # Save the initial JSON as CSV
-    cleaner.visualize_missingness()  # Visualize missingness of the full dataset
-    cleaner.data_quality_tests()  # Perform data quality checks on the full dataset
-    cleaner.handle_missing_values(strategy='drop')  # Handle missing values for full dataset
-    cleaner.remove_duplicates()  # Remove duplicates from full dataset
-    cleaner.analyze_data_points()  # Analyze data points in the full dataset
-    # cleaner.write_report('cleaned_business_' + i + '.txt')  # Write a report summarizing the cleaning steps
-    # sampled_data = cleaner.perform_sampling(method='random', sample_fraction=0.1)  # Perform random sampling
-
-
-    # Perform all tests and processing on the sample
-    print("\n=== Data Quality Tests for the Sample ===")
-    # cleaner.visualize_missingness(data=sampled_data)  # Visualize missingness of the sample
-    # cleaner.data_quality_tests(data=sampled_data)  # Perform data quality checks on the sample
-    # cleaner.handle_missing_values(strategy='mean', data=sampled_data)  # Handle missing values for the sample
-    # cleaner.remove_duplicates(data=sampled_data)  # Remove duplicates from the sample
-    # cleaner.analyze_data_points(data=sampled_data)  # Analyze data points in the sample
-    # cleaner.save_cleaned_data('crosslisted_reviews_sample_data.csv', data=sampled_data)  # Save the cleaned sample
-    # cleaner.write_report('crosslisted_reviews_sample_report.txt')  # Write a report summarizing the cleaning steps
\ No newline at end of file
+if __name__ == '__main__':
+    cities = ['Tucson', 'Tampa']
+    for i in cities:
+        cleaner = DataCleaning('crosslisted_reviews_' + i + '.ndjson', file_type='ndjson')
+        # The steps run on collect() and share their scans of the data
+        (cleaner.lazy()
+            .normalize_dictionary_columns()  # Normalize dictionary columns like 'attributes' and 'hours'
+            .save_as_csv('crosslisted_reviews_' + i + '.csv')  # Save the initial JSON as CSV
+            .visualize_missingness()  # Visualize missingness of the full dataset
+            .data_quality_tests()  # Perform data quality checks on the full dataset
+            .handle_missing_values(strategy='drop')  # Handle missing values for full dataset
+            .remove_duplicates()  # Remove duplicates from full dataset
+            .analyze_data_points()  # Analyze data points in the full dataset
+            # .write_report('cleaned_business_' + i + '.txt')  # Write a report summarizing the cleaning steps
+            .collect())
+        # sampled_data = cleaner.perform_sampling(method='random', sample_fraction=0.1)  # Perform random sampling
+
+
+        # Perform all tests and processing on the sample
+        print("\n=== Data Quality Tests for the Sample ===")
+        # cleaner.visualize_missingness(data=sampled_data)  # Visualize missingness of the sample
+        # cleaner.data_quality_tests(data=sampled_data)  # Perform data quality checks on the sample
+        # cleaner.handle_missing_values(strategy='mean', data=sampled_data)  # Handle missing values for the sample
+        # cleaner.remove_duplicates(data=sampled_data)  # Remove duplicates from the sample
+        # cleaner.analyze_data_points(data=sampled_data)  # Analyze data points in the sample
+        # cleaner.save_cleaned_data('crosslisted_reviews_sample_data.csv', data=sampled_data)  # Save the cleaned sample
+        # cleaner.write_report('crosslisted_reviews_sample_report.txt')  # Write a report summarizing the cleaning steps
+
+    # Dumps bigger than memory go through the same steps chunk by chunk, e.g. the full review dump:
+    # cleaner = ChunkedDataCleaning('yelp_academic_dataset_review.json', file_type='ndjson')
+    # cleaner.write_report('review_report.txt')
+    # cleaner.normalize_dictionary_columns()
+    # cleaner.handle_missing_values(strategy='drop')
+    # cleaner.remove_duplicates()
+    # cleaner.save_cleaned_data('cleaned_reviews.csv')
@@ -0,0 +1,364 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
+from ndjson_reader import chunk_ranges, parse_chunk, to_array
+
+# Bytes of NDJSON profiled per task, which bounds the memory of each worker
+PROFILE_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Hash of a missing value, whether it is None, NaN or NaT
+MISSING_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def hash_values(values):
+    """64-bit hashes of the values of a Series, equal for equal values also across chunks."""
+    # Chunks infer their own dtypes, so integers are hashed as floats like in chunks with missing values,
+    # booleans as objects like in chunks with missing values, and every missing value the same
+    if is_numeric(values):
+        values = values.astype(float)
+    elif pd.api.types.is_bool_dtype(values):
+        values = values.astype(object)
+    # Factorizing first only pays off for columns with few distinct values
+    hashes = pd.util.hash_pandas_object(values, index=False, categorize=False).to_numpy()
+    hashes[values.isna().to_numpy()] = MISSING_HASH
+    return hashes
+
+
+def combine_hashes(column_hashes, n_rows):
+    digests = np.zeros(n_rows, dtype=np.uint64)
+    for hashes in column_hashes:
+        # Multiplying wraps around in uint64, which keeps the column order significant
+        digests = (digests * np.uint64(0x100000001B3)) ^ hashes
+    return digests
+
+
+def row_digests(data):
+    """64-bit hashes of the rows of data, equal for rows with equal values also across chunks."""
+    return combine_hashes((hash_values(data[column]) for column in data.columns), len(data))
+
+
+class HyperLogLog:
+    """
+    Approximate count of distinct hashes in 2**precision one-byte registers, with a
+    standard error of about 1.04 / sqrt(2**precision), 0.8% for the default.
+    Sketches of the same precision are merged by taking the register-wise maximum.
+    """
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, hashes):
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        # Position of the first set bit after the index bits, the guard bit caps it
+        rest = (hashes << np.uint64(self.precision)) | np.uint64(1 << (self.precision - 1))
+        rank = 65 - np.frexp(rest.astype(float))[1]
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(float))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    """
+    Approximate quantiles from counts of logarithmically sized buckets (DDSketch). A
+    quantile is returned within relative_accuracy of a value of the right rank, and
+    sketches with the same accuracy are merged by adding their bucket counts.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add_buckets(self, buckets, magnitudes):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / np.log(self.gamma)).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+
+    def add(self, values):
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        self.add_buckets(self.positive, values[values > 0])
+        self.add_buckets(self.negative, -values[values < 0])
+        self.zeros += int(np.count_nonzero(values == 0))
+
+    def merge(self, other):
+        for buckets, other_buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_buckets.items():
+                buckets[key] = buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def bucket_value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        # Negative buckets from the largest magnitude up, then zero, then the positive buckets
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self.bucket_value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self.bucket_value(key)
+        return self.bucket_value(max(self.positive))
+
+
+class ColumnSketch:
+    """
+    Mergeable summary of one column: null count, approximate distinct count and, for
+    numeric columns, min, max, mean, standard deviation and approximate quantiles.
+    """
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.numeric = False
+        self.min = np.inf
+        self.max = -np.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.quantiles = QuantileSketch()
+        self.distinct = HyperLogLog()
+
+    def add(self, series, hashes):
+        """Add the values of series, given the hash_values of all of them."""
+        missing = series.isna().to_numpy()
+        self.count += len(series)
+        self.nulls += int(missing.sum())
+        values = series[~missing]
+        if len(values) == 0:
+            return
+        self.distinct.add(hashes[~missing])
+        if is_numeric(values):
+            numbers = values.to_numpy(dtype=float)
+            part = ColumnSketch()
+            part.numeric = True
+            part.min, part.max = numbers.min(), numbers.max()
+            part.mean = numbers.mean()
+            part.m2 = ((numbers - part.mean) ** 2).sum()
+            part.quantiles.add(numbers)
+            self.merge_numbers(part)
+
+    def add_nulls(self, count):
+        self.count += count
+        self.nulls += count
+
+    def values(self):
+        return self.count - self.nulls
+
+    def merge_numbers(self, other):
+        # Count, mean and sum of squared deviations of the numbers of both, combined like Chan et al.
+        n = self.quantiles.count
+        m = other.quantiles.count
+        if m:
+            delta = other.mean - self.mean
+            self.mean += delta * m / (n + m)
+            self.m2 += other.m2 + delta * delta * n * m / (n + m)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.quantiles.merge(other.quantiles)
+            self.numeric = True
+
+    def merge(self, other):
+        self.merge_numbers(other)
+        self.count += other.count
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        return self
+
+    def summary(self):
+        summary = {'count': self.values(), 'distinct': self.distinct.estimate()}
+        if self.numeric:
+            n = self.quantiles.count
+            summary.update({
+                'mean': self.mean,
+                'std': np.sqrt(self.m2 / (n - 1)) if n > 1 else np.nan,
+                'min': self.min,
+                # Bucket values can lie just outside the data
+                '25%': np.clip(self.quantiles.quantile(0.25), self.min, self.max),
+                '50%': np.clip(self.quantiles.quantile(0.5), self.min, self.max),
+                '75%': np.clip(self.quantiles.quantile(0.75), self.min, self.max),
+                'max': self.max,
+            })
+        return summary
+
+
+class DataSketch:
+    """
+    Mergeable profile of a table, built in one pass over each chunk: a ColumnSketch per
+    column and the set of 64-bit row digests, from which duplicate rows are counted.
+    Sketches of separate chunks are merged into the profile of the whole table.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+        self.digests = np.empty(0, dtype=np.uint64)
+
+    def add(self, data):
+        column_hashes = []
+        for column in data.columns:
+            if column not in self.columns:
+                # Rows added before the column was seen did not have it
+                self.columns[column] = ColumnSketch()
+                self.columns[column].add_nulls(self.rows)
+            # Each column is hashed once, for its distinct count and for the row digests
+            column_hashes.append(hash_values(data[column]))
+            self.columns[column].add(data[column], column_hashes[-1])
+        for column in self.columns:
+            if column not in data.columns:
+                self.columns[column].add_nulls(len(data))
+        self.digests = np.union1d(self.digests, combine_hashes(column_hashes, len(data)))
+        self.rows += len(data)
+        return self
+
+    def merge(self, other):
+        for column, sketch in other.columns.items():
+            if column not in self.columns:
+                self.columns[column] = ColumnSketch()
+                self.columns[column].add_nulls(self.rows)
+            self.columns[column].merge(sketch)
+        for column in self.columns:
+            if column not in other.columns:
+                self.columns[column].add_nulls(other.rows)
+        self.digests = np.union1d(self.digests, other.digests)
+        self.rows += other.rows
+        return self
+
+    @property
+    def duplicates(self):
+        # Rows with a digest that an earlier row already had, exact up to hash collisions
+        return self.rows - len(self.digests)
+
+    def summary(self):
+        """describe()-like table of the columns."""
+        return pd.DataFrame({column: sketch.summary() for column, sketch in self.columns.items()})
+
+    def missing(self):
+        return pd.Series({column: sketch.nulls for column, sketch in self.columns.items()}, dtype=np.int64)
+
+    def ranges(self):
+        return [(column, sketch.min, sketch.max) for column, sketch in self.columns.items() if sketch.numeric]
+
+
+def profile_frame(data):
+    return DataSketch().add(data)
+
+
+def profile_chunk(input_file, start, end):
+    """Profile of the records in a byte range of an NDJSON file."""
+    data, _ = parse_chunk(input_file, start, end)
+    return profile_frame(pd.DataFrame({column: to_array(values) for column, values in data.items()}))
+
+
+def profile_ndjson(input_file, workers=None):
+    """
+    Profile of an NDJSON file. Byte ranges of the file are profiled in parallel by a
+    process pool and their sketches merged, so only one range per worker is in memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = chunk_ranges(input_file, max(1, os.path.getsize(input_file) // PROFILE_CHUNK_BYTES))
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+    sketch = DataSketch()
+    if workers > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(profile_chunk, repeat(input_file), starts, ends):
+                sketch.merge(part)
+    else:
+        for start, end in ranges:
+            sketch.merge(profile_chunk(input_file, start, end))
+    return sketch
+
+
+def csv_dtypes(input_file, chunk_size=100000):
+    """
+    Column types for reading a CSV file in chunks, from a first pass over it. read_csv infers
+    the types of each chunk on its own, so a value like a postal code can be a number in one
+    chunk and text in the next. Columns that are numbers in every chunk are read as floats if
+    any chunk has a float, and columns that are not are read as strings.
+    """
+    numeric = {}
+    floating = set()
+    for chunk in pd.read_csv(input_file, chunksize=chunk_size):
+        for column in chunk.columns:
+            values = chunk[column]
+            # A chunk without any value of the column reads it as float, like a whole file with missing values
+            if values.isna().all() or pd.api.types.is_float_dtype(values):
+                floating.add(column)
+            numeric[column] = numeric.get(column, True) and (values.isna().all() or is_numeric(values))
+    dtypes = {}
+    for column, is_number in numeric.items():
+        if not is_number:
+            dtypes[column] = str
+        elif column in floating:
+            dtypes[column] = float
+    return dtypes
+
+
+def profile_csv(input_file, chunk_size=100000, dtypes=None):
+    """Profile of a CSV file, read in chunks of chunk_size rows with the column types of csv_dtypes."""
+    if dtypes is None:
+        dtypes = csv_dtypes(input_file, chunk_size)
+    # Quoted fields can span lines, so a CSV cannot be split into byte ranges like NDJSON
+    sketch = DataSketch()
+    for chunk in pd.read_csv(input_file, chunksize=chunk_size, dtype=dtypes):
+        sketch.add(chunk)
+    return sketch
+
+
+def write_sketch_report(sketch, report_path):
+    """Write a report in the layout of DataCleaning.write_report from a DataSketch."""
+    with open(report_path, 'w') as report_file:
+        report_file.write(f"Data Profile Report\n")
+        report_file.write(f"{'='*40}\n")
+        report_file.write(f"Dataset shape: {(sketch.rows, len(sketch.columns))}\n\n")
+
+        # Quantiles and distinct counts are approximate
+        report_file.write("Summary Statistics (approximate quantiles and distinct counts):\n")
+        report_file.write(f"{sketch.summary()}\n\n")
+
+        report_file.write("Missing Values per Column:\n")
+        report_file.write(f"{sketch.missing()}\n\n")
+
+        report_file.write(f"Duplicate rows: {sketch.duplicates}\n\n")
+
+        report_file.write("Numeric Column Ranges:\n")
+        for col, low, high in sketch.ranges():
+            report_file.write(f"{col}: {low} to {high}\n")
+
+        report_file.write("\nReport complete.\n")
+    print(f"Report written to {report_path}")
+
+
+if __name__ == '__main__':
+    write_sketch_report(profile_ndjson('yelp_academic_dataset_review.json'), 'review_profile_report.txt')
@@ -0,0 +1,28 @@
+import os
+import sys
+import pandas as pd
+
+# Reuse the dashboard's helpers so the stored totals match what it would compute itself
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from categories import process_categories
+from rating_aggregates import business_rating_history, save_rating_history
+from columnar_export import categories_of_interest, weekdays
+
+
+def export_rating_aggregates(business_path, review_path, output_path):
+    """Writes the daily rating sums and counts per category of a city, for the rolling ratings of the dashboard."""
+    # Same business selection as the dashboard: with an address and open every day
+    df_business = pd.read_csv(business_path)
+    df_business = df_business.dropna(subset=['address'])
+    df_business = process_categories(df_business, categories_of_interest)
+    for day in weekdays:
+        df_business = df_business[df_business['hours_' + day] != 'Closed']
+
+    df_review = pd.read_csv(review_path, usecols=['business_id', 'stars', 'date'])
+    save_rating_history(output_path, business_rating_history(df_business, df_review))
+    print(f"Rating aggregates written to {output_path} for {len(df_review)} reviews")
+
+
+if __name__ == '__main__':
+    for i in 'Tucson', 'Tampa':
+        export_rating_aggregates('cleaned_businessV2_' + i + '.csv', 'crosslisted_reviews_' + i + '.csv', 'rating_aggregates_' + i + '.npz')
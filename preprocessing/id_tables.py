@@ -0,0 +1,37 @@
+from record_writers import open_record_writer, read_records
+
+
+class IdTable:
+    """
+    Dense integer ids (0, 1, 2, ...) for string keys such as Yelp's 22-character
+    business_id. The table is persisted as (id, key) rows so the original keys can
+    be looked up again, and it fits in int32 for the sizes of the Yelp dataset.
+    """
+    def __init__(self, key_name):
+        self.key_name = key_name
+        self.ids = {}
+
+    def encode(self, key):
+        """Returns the id of key, assigning the next free one to new keys."""
+        key_id = self.ids.get(key)
+        if key_id is None:
+            key_id = self.ids[key] = len(self.ids)
+        return key_id
+
+    def get(self, key):
+        return self.ids.get(key)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def save(self, output_file):
+        with open_record_writer(output_file) as writer:
+            for key, key_id in self.ids.items():
+                writer.write({'id': key_id, self.key_name: key})
+
+    @classmethod
+    def load(cls, input_file, key_name):
+        table = cls(key_name)
+        for record in read_records(input_file):
+            table.ids[record[key_name]] = int(record['id'])
+        return table
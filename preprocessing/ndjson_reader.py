@@ -0,0 +1,260 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # orjson is optional, the standard library parser gives the same results
+    loads = json.loads
+
+# Below this many bytes per chunk, starting more worker processes does not pay off
+MIN_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Bytes read per block when streaming records
+BLOCK_BYTES = 4 * 1024 * 1024
+
+# The value after a key: a colon, then a string (with escapes) or a scalar literal
+VALUE = rb'\s*:\s*(?:"([^"\\]*(?:\\.[^"\\]*)*)"|([^\s,}\]]+))'
+
+
+def scalar(literal):
+    if literal == b'null':
+        return None
+    if literal in (b'true', b'false'):
+        return literal == b'true'
+    if any(c in literal for c in b'.eE'):
+        return float(literal)
+    return int(literal)
+
+
+def decode_strings(strings):
+    # JSON strings cannot contain a raw NUL, so the whole column is decoded at once
+    values = b'\0'.join(strings).decode('utf-8').split('\0')
+    for i, value in enumerate(values):
+        if '\\' in value:
+            values[i] = json.loads('"' + value + '"')
+    return values
+
+
+def decode_column(strings, literals):
+    # Scalars never match empty, so an empty literal means the value was a string
+    if not any(literals):
+        return decode_strings(strings)
+    if all(literals):
+        return [scalar(literal) for literal in literals]
+    return [scalar(literal) if literal else decode_strings([string])[0] for string, literal in zip(strings, literals)]
+
+
+class FieldScanner:
+    """
+    Extracts a few fields from a block of flat NDJSON records without parsing the
+    records. All fields are found in one regex scan over the whole block, so long
+    values that are not needed (like a review's text) are skipped in C and never
+    turned into Python strings. An unescaped key followed by a colon cannot occur
+    inside a JSON string, so only real keys match.
+    """
+    def __init__(self, fields):
+        self.fields = list(fields)
+        keys = b'|'.join(re.escape(field.encode()) for field in self.fields)
+        self.pattern = re.compile(b'"(' + keys + b')"' + VALUE)
+
+    def scan(self, block):
+        """Column lists of the fields of the records in block, which has to end on a line boundary."""
+        n_records = block.count(b'\n') + (not block.endswith(b'\n'))
+        strings = {field.encode(): [] for field in self.fields}
+        literals = {field.encode(): [] for field in self.fields}
+        for key, string, literal in self.pattern.findall(block):
+            strings[key].append(string)
+            literals[key].append(literal)
+        if any(len(values) != n_records for values in strings.values()):
+            # A record without a field, a nested one or blank lines: parse the records
+            return self.parse(block)
+        return {
+            field: decode_column(strings[field.encode()], literals[field.encode()])
+            for field in self.fields
+        }
+
+    def parse(self, block):
+        records = [loads(line) for line in block.split(b'\n') if line.strip()]
+        return {field: [record.get(field) for record in records] for field in self.fields}
+
+
+def scan_records(input_file, fields):
+    """Yields the given fields of each record of an NDJSON file as dicts, reading it in blocks with a FieldScanner."""
+    scanner = FieldScanner(fields)
+    rest = b''
+    with open(input_file, 'rb') as f:
+        while True:
+            data = f.read(BLOCK_BYTES)
+            block = rest + data
+            if data:
+                # Keep the incomplete last line for the next block
+                cut = block.rfind(b'\n') + 1
+                block, rest = block[:cut], block[cut:]
+            if block.strip():
+                columns = scanner.scan(block)
+                for values in zip(*columns.values()):
+                    yield dict(zip(scanner.fields, values))
+            if not data:
+                return
+
+
+def chunk_ranges(input_file, n_chunks):
+    """Splits a file into n_chunks (start, end) byte ranges that begin and end on line boundaries."""
+    size = os.path.getsize(input_file)
+    bounds = [0]
+    with open(input_file, 'rb') as f:
+        for i in range(1, n_chunks):
+            f.seek(max(size * i // n_chunks, bounds[-1]))
+            # Move on to the start of the next line
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def flatten(prefix, value, row, data, flattened, n_rows):
+    for key, item in value.items():
+        name = prefix + key
+        if isinstance(item, dict):
+            # Deeper levels are joined with '.', like json_normalize does
+            flatten(name + '.', item, row, data, flattened, n_rows)
+        else:
+            column = data.get(name)
+            if column is None:
+                column = data[name] = [None] * n_rows
+                flattened.add(name)
+            column[row] = item
+
+
+def parse_lines(lines, columns=None, nested=None, keep_declared=False):
+    """
+    Parses NDJSON lines into a dict of column lists. The objects in the fields of nested
+    are flattened while parsing into '<field>_<key>' columns, which are preallocated for
+    the keys that nested declares for the field. Keys it does not declare get columns
+    when they are first seen, and declared ones that no record has are left out unless
+    keep_declared is set.
+    """
+    n_rows = len(lines)
+    nested = nested or {}
+    data = {column: [None] * n_rows for column in columns if column not in nested} if columns is not None else {}
+    # Column lists of the keys of each nested field, starting with the declared ones
+    targets = {field: {key: [None] * n_rows for key in keys} for field, keys in nested.items() if columns is None or field in columns}
+    declared = {field + '_' + key: values for field, keys in targets.items() for key, values in keys.items()}
+    data.update(declared)
+    flattened = set(declared)
+
+    count = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        record = loads(line)
+        for key, value in record.items():
+            if key in nested and (value is None or isinstance(value, dict)):
+                target = targets.get(key)
+                if not value or target is None:
+                    continue
+                for sub_key, item in value.items():
+                    column = target.get(sub_key)
+                    if column is None or isinstance(item, dict):
+                        flatten(key + '_', {sub_key: item}, count, data, flattened, n_rows)
+                        if not isinstance(item, dict):
+                            target[sub_key] = data[key + '_' + sub_key]
+                    else:
+                        column[count] = item
+            elif columns is None or key in data:
+                column = data.get(key)
+                if column is None:
+                    # Columns first seen in this record are None for the records before it
+                    column = data[key] = [None] * n_rows
+                column[count] = value
+        count += 1
+
+    result = {}
+    # The flattened columns come after the others, like the columns json_normalize adds
+    for name in sorted(data, key=lambda name: name in flattened):
+        values = data[name]
+        del values[count:]
+        if name in declared and not keep_declared and values.count(None) == count:
+            continue
+        result[name] = values
+    return result, count
+
+
+def parse_chunk(input_file, start, end, columns=None, scan=False, nested=None):
+    """Parses the records in a byte range of an NDJSON file into a dict of column lists."""
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        block = f.read(end - start)
+    if scan:
+        # Only the requested fields are extracted, the records are not parsed
+        data = FieldScanner(columns).scan(block)
+        return data, len(data[columns[0]]) if columns else 0
+    return parse_lines(block.split(b'\n'), columns, nested)
+
+
+def iter_ndjson_chunks(input_file, chunk_size, columns=None, nested=None):
+    """
+    Yields the records of an NDJSON file chunk_size lines at a time, as dicts of column
+    arrays. Every chunk has all the columns that nested declares, so they do not come
+    and go between chunks.
+    """
+    with open(input_file, 'rb') as f:
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                return
+            data, _ = parse_lines(lines, columns, nested, keep_declared=True)
+            yield {name: to_array(values) for name, values in data.items()}
+
+
+def to_array(values):
+    # Typed arrays for numeric columns, object arrays for strings, dicts and mixed values
+    array = np.array(values, dtype=object)
+    kind = pd.api.types.infer_dtype(array, skipna=True)
+    if kind == 'integer' and not pd.isna(array).any():
+        return array.astype(np.int64)
+    if kind in ('integer', 'floating', 'mixed-integer-float'):
+        return np.where(pd.isna(array), np.nan, array).astype(float)
+    if kind == 'boolean' and not pd.isna(array).any():
+        return array.astype(bool)
+    return array
+
+
+def read_ndjson_columns(input_file, columns=None, workers=None, scan=False, nested=None):
+    """
+    Reads an NDJSON file into a dict of column arrays. The file is split into byte
+    ranges on line boundaries that are parsed in parallel by a process pool, using
+    orjson if it is installed. With columns, only those keys are kept, and with
+    scan they are extracted by a FieldScanner instead of parsing whole records.
+    The fields of nested are flattened while parsing, see parse_lines.
+    """
+    if scan and columns is None:
+        raise ValueError("scan needs the columns to extract.")
+    if scan and nested:
+        raise ValueError("scan only extracts flat fields.")
+    workers = workers or os.cpu_count() or 1
+    n_chunks = max(1, min(workers, os.path.getsize(input_file) // MIN_CHUNK_BYTES))
+    ranges = chunk_ranges(input_file, n_chunks)
+
+    if len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            futures = [pool.submit(parse_chunk, input_file, start, end, columns, scan, nested) for start, end in ranges]
+            chunks = [future.result() for future in futures]
+    else:
+        chunks = [parse_chunk(input_file, start, end, columns, scan, nested) for start, end in ranges]
+
+    # Columns in the order they were first seen, missing values are None
+    names = list(columns) if columns is not None and not nested else list(dict.fromkeys(key for data, _ in chunks for key in data))
+    result = {}
+    for name in names:
+        values = []
+        for data, count in chunks:
+            values.extend(data.get(name, [None] * count))
+        result[name] = to_array(values)
+    return result
@@ -0,0 +1,135 @@
+import csv
+import json
+import os
+
+
+class JsonArrayWriter:
+    """
+    Stream records into a JSON array, so the output can still be read with json.load.
+    """
+    def __init__(self, output_file):
+        self.file = open(output_file, 'w', encoding='utf-8')
+        self.file.write('[')
+        self.count = 0
+
+    def write(self, record):
+        if self.count > 0:
+            self.file.write(',')
+        self.file.write('\n')
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        self.file.write('\n]\n')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class NdjsonWriter:
+    """
+    Write one JSON object per line (NDJSON), the same layout as the raw Yelp dumps.
+    """
+    def __init__(self, output_file):
+        self.file = open(output_file, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.file.write('\n')
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvChunkWriter:
+    """
+    Write records to a CSV file in chunks of chunk_size rows.
+    The header is taken from the first record unless fieldnames are given.
+    Nested values (e.g. 'hours' or 'attributes') are stored as JSON strings.
+    """
+    def __init__(self, output_file, fieldnames=None, chunk_size=10000):
+        self.file = open(output_file, 'w', encoding='utf-8', newline='')
+        self.fieldnames = fieldnames
+        self.chunk_size = chunk_size
+        self.writer = None
+        self.buffer = []
+        self.count = 0
+
+    def write(self, record):
+        self.buffer.append(record)
+        self.count += 1
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.writer is None:
+            if self.fieldnames is None:
+                self.fieldnames = list(self.buffer[0].keys())
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, extrasaction='ignore')
+            self.writer.writeheader()
+        for record in self.buffer:
+            self.writer.writerow({key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+                                  for key, value in record.items()})
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def output_format_of(path):
+    """Derives the output format from the file extension: 'ndjson', 'csv' or 'json'."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if extension == '.csv':
+        return 'csv'
+    return 'json'
+
+
+def open_record_writer(output_file, output_format=None, **kwargs):
+    """Opens an incremental writer for output_file. The format defaults to the one implied by the extension."""
+    if output_format is None:
+        output_format = output_format_of(output_file)
+    if output_format == 'json':
+        return JsonArrayWriter(output_file)
+    elif output_format == 'ndjson':
+        return NdjsonWriter(output_file)
+    elif output_format == 'csv':
+        return CsvChunkWriter(output_file, **kwargs)
+    else:
+        raise ValueError("Unsupported output format. Use 'json', 'ndjson' or 'csv'.")
+
+
+def read_records(input_file):
+    """Yields the records of a file written by one of the writers above."""
+    input_format = output_format_of(input_file)
+    with open(input_file, encoding='utf-8', newline='') as f:
+        if input_format == 'ndjson':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif input_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            yield from json.load(f)
@@ -1,18 +1,20 @@
+import os
+import sys
 import pandas as pd
 
-# Function to fix the time format (adding leading zeros where necessary)
-def fill_missing_zeros(time_str):
-    if pd.isna(time_str) or time_str == '0:0-0:0':
-        return 'Closed'
-    time_ranges = time_str.split('-')
-    fixed_time = []
-    for time_range in time_ranges:
-        hours, minutes = time_range.split(':')
-        # Add leading zero if necessary
-        fixed_hours = hours.zfill(2)
-        fixed_minutes = minutes.zfill(2)
-        fixed_time.append(f"{fixed_hours}:{fixed_minutes}")
-    return '-'.join(fixed_time)
+# The hours parser is shared with the dashboard
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from hours import WEEKDAYS, hours_features, normalize_hours
+
+# Fix the time format (adding leading zeros where necessary) and store the minute of day
+# of opening and closing next to it, so later steps do not have to parse the strings
+def normalize_hours_columns(df):
+    for day in WEEKDAYS:
+        if 'hours_' + day in df.columns:
+            df['hours_' + day], opening, closing = normalize_hours(df['hours_' + day])
+            df[day + '_Minute_Of_Opening'] = opening
+            df[day + '_Minute_Of_Closing'] = closing
+    return df
 
 
 # Load the CSV file
@@ -26,12 +28,21 @@ for i in 'Tucson', 'Tampa':
     # Filter rows where the 'categories' column contains the word "Restaurant" (case insensitive)
     df_filtered = df[df['categories'].str.contains("restaurant", case=False, na=False)].copy()
 
-    # Apply the function to fix the time format for columns generated from the 'hours' dictionary
-    for day in ['hours_Monday', 'hours_Tuesday', 'hours_Wednesday', 'hours_Thursday', 'hours_Friday', 'hours_Saturday', 'hours_Sunday']:
-        if day in df_filtered.columns:
-            df_filtered[day] = df_filtered[day].apply(fill_missing_zeros)
+    # Fix the time format of the columns generated from the 'hours' dictionary
+    df_filtered = normalize_hours_columns(df_filtered)
     # Save the cleaned and filtered data to a new CSV file
     filename = 'cleaned_businessV2_' + i + '.csv'
     df_filtered.to_csv(filename, index=False)
 
     print("Data cleaned and saved to " + filename)
+
+    # Save the opening-hour features as a separate table keyed by business_id
+    features_filename = 'hours_features_' + i + '.csv'
+    hours_features(df_filtered).to_csv(features_filename, index=False)
+
+    print("Opening-hour features saved to " + features_filename)
+
+# Philadelphia's cleaned_businessV2.csv comes ready-made, only its features are derived here
+hours_features(pd.read_csv('cleaned_businessV2.csv')).to_csv('hours_features_Philadelphia.csv', index=False)
+
+print("Opening-hour features saved to hours_features_Philadelphia.csv")
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+
+def tag_categories(category_lists, categories):
+    """
+    Category of interest of each category list, as a Categorical with "Other"
+    first. Like one str.contains per category with the later ones overwriting the
+    earlier ones, a list gets the last category in `categories` it contains. The
+    lists are tagged in a single pass, and identical lists only once.
+    """
+    codes, lists = pd.factorize(pd.Series(category_lists, copy=False))
+    by_priority = list(enumerate(categories, start=1))[::-1]
+
+    def tag(category_list):
+        for code, item in by_priority:
+            if item in category_list:
+                return code
+        return 0
+
+    # Missing lists have code -1, which picks the trailing "Other"
+    tagged = np.array([tag(category_list) for category_list in lists] + [0])
+    return pd.Categorical.from_codes(tagged[codes], ["Other"] + list(categories))
+
+
+def process_categories(df, categories):
+    # Create new column containing a specific category of interest
+    df["category_of_interest"] = tag_categories(df["categories"], categories)
+    return df
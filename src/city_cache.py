@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def file_signature(paths):
+    # Modification times of the files a city is loaded from (None for missing files)
+    return tuple(
+        (path, os.path.getmtime(path) if os.path.exists(path) else None)
+        for path in paths
+    )
+
+
+def data_size(value):
+    # Approximate memory footprint of a (nested) result made of DataFrames/Series/arrays
+    if isinstance(value, (tuple, list)):
+        return sum(data_size(item) for item in value)
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    return getattr(value, "nbytes", 0)
+
+
+class CityDataCache:
+    """
+    LRU cache of loaded city data, kept at module level so that all sessions of a
+    `bokeh serve` process share one copy. Entries are keyed by city and the mtimes
+    of its files, and the least recently used cities are evicted once the cached
+    data exceeds max_bytes. Cached DataFrames are shared and must be treated as
+    read-only by the sessions.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        # One lock per key that is being loaded, so concurrent sessions load it once
+        self.loading = {}
+
+    def lookup(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key]
+            return False, None
+
+    def get(self, city, paths, loader):
+        key = (city, file_signature(paths))
+        found, value = self.lookup(key)
+        if found:
+            return value
+        with self.lock:
+            key_lock = self.loading.setdefault(key, threading.Lock())
+
+        # Only the sessions waiting for this key block while it loads
+        with key_lock:
+            found, value = self.lookup(key)
+            if found:
+                return value
+            try:
+                with self.lock:
+                    self.misses += 1
+                value = loader(city)
+                self.insert(key, value)
+            finally:
+                with self.lock:
+                    self.loading.pop(key, None)
+            return value
+
+    def insert(self, key, value):
+        with self.lock:
+            # Entries of the same city built from older files are stale now
+            for stale_key in [k for k in self.entries if k[0] == key[0] and k != key]:
+                self.evict(stale_key)
+
+            self.entries[key] = value
+            self.sizes[key] = data_size(value)
+            # Evict least recently used cities, but always keep the newest entry
+            while self.total_bytes() > self.max_bytes and len(self.entries) > 1:
+                self.evict(next(iter(self.entries)))
+
+    def evict(self, key):
+        with self.lock:
+            del self.entries[key]
+            del self.sizes[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+
+    def total_bytes(self):
+        return sum(self.sizes.values())
+
+
+# Memory budget in MB, configurable through the environment of the bokeh server
+city_cache = CityDataCache(
+    max_bytes=int(os.environ.get("DASH_CITY_CACHE_MB", "1024")) * 1024 * 1024
+)
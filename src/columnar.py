@@ -0,0 +1,47 @@
+import os
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # Columnar files are optional, fall back to the CSVs
+    feather = None
+
+
+def columnar_path(csv_path):
+    # The columnar copy of a table sits next to its CSV, e.g. "cleaned_businessV2_Tampa.feather"
+    return os.path.splitext(csv_path)[0] + ".feather"
+
+
+def has_columnar_copy(csv_path):
+    path = columnar_path(csv_path)
+    if feather is None or not os.path.exists(path):
+        return False
+    # Ignore columnar files that are older than the CSV they were exported from
+    return not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(
+        csv_path
+    )
+
+
+def read_table(csv_path):
+    """
+    Read a table from its memory-mapped columnar copy if there is one, else from the CSV.
+    Numeric columns without missing values are read-only views of the mapped file, the
+    other columns are converted into pandas memory.
+    """
+    if has_columnar_copy(csv_path):
+        table = feather.read_table(columnar_path(csv_path), memory_map=True)
+        # One block per column keeps the buffers shared, and each column of the table is
+        # released once converted
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    return pd.read_csv(csv_path)
+
+
+def write_table(df, csv_path):
+    # Uncompressed Arrow IPC in a single record batch, so that read_table can use the
+    # memory-mapped buffers directly instead of joining the batches of each column
+    feather.write_feather(
+        df.reset_index(drop=True),
+        columnar_path(csv_path),
+        compression="uncompressed",
+        chunksize=max(len(df), 1),
+    )
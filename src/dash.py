@@ -1,11 +1,22 @@
-import pandas as pd
+import os
 from bokeh.plotting import curdoc
 from bokeh.layouts import column, Spacer, gridplot
 from bokeh.models import Slider
-from scatter import create_scatter_plot, update_plot
-from hex_binning import create_hexbin_plot
-from historical_chart import create_historical_chart
+from scatter import create_scatter_plot, update_plot, DayIndex, link_client_filters
+from hours import add_hour_columns
+from hex_binning import create_hexbin_plot, add_mercator_columns
+from hex_pyramid import HexPyramid
+from historical_chart import create_historical_chart, update_historical_chart
 from bokeh.models import Select
+from columnar import read_table, has_columnar_copy, columnar_path
+from city_cache import city_cache
+from scheduler import CallbackScheduler
+from categories import process_categories
+from rating_aggregates import (
+    business_rating_history,
+    has_rating_history,
+    load_rating_history,
+)
 
 ####################################
 # City-Specific File Setup
@@ -15,74 +26,92 @@ city_files = {
     "Philadelphia": {
         "business": "../data/cleaned_businessV2.csv",
         "reviews": "../data/crosslisted_reviews.csv",
+        "hours_features": "../data/hours_features_Philadelphia.csv",
+        "rating_aggregates": "../data/rating_aggregates_Philadelphia.npz",
     },
     "Tucson": {
-        "business": "../data/cleaned_business_Tucson.csv",
+        "business": "../data/cleaned_businessV2_Tucson.csv",
         "reviews": "../data/crosslisted_reviews_Tucson.csv",
+        "hours_features": "../data/hours_features_Tucson.csv",
+        "rating_aggregates": "../data/rating_aggregates_Tucson.npz",
     },
     "Tampa": {
-        "business": "../data/cleaned_business_Tampa.csv",
+        "business": "../data/cleaned_businessV2_Tampa.csv",
         "reviews": "../data/crosslisted_reviews_Tampa.csv",
+        "hours_features": "../data/hours_features_Tampa.csv",
+        "rating_aggregates": "../data/rating_aggregates_Tampa.npz",
     },
 }
 
 
 def load_city_data(city):
-    """Load city-specific business and review data."""
+    """Load city-specific business and review data, shared by all sessions through the city cache."""
+    paths = list(city_files[city].values())
+    paths += [columnar_path(path) for path in paths]
+    return city_cache.get(city, paths, read_city_data)
+
+
+def read_city_data(city):
+    """Read and process city-specific business and review data."""
     paths = city_files[city]
 
-    # Load business data
+    # Load business data (columnar copies already carry category_of_interest)
     df_business = load_data(paths["business"])
-    df_business = process_categories(df_business, categories_of_interest)
+    if "category_of_interest" not in df_business.columns:
+        df_business = process_categories(df_business, categories_of_interest)
     df_business = filter_hours(df_business, weekdays)
-
-    # Load reviews data specific to the city
-    df_review = pd.read_csv(paths["reviews"])
-    df_review.rename(columns={"stars": "review_stars"}, inplace=True)
-    df_joined = pd.merge(df_business, df_review, on="business_id", how="inner")
-    df_joined = df_joined.convert_dtypes()
-    df_joined = process_categories(df_joined, categories_of_interest)
-
-    # Process data for historical chart
-    df_joined = df_joined[["review_stars", "date", "category_of_interest"]]
-    df_joined["date"] = pd.to_datetime(df_joined["date"])
-    df_joined = df_joined.sort_values(by="date")
-    df_pivot = df_joined.pivot_table(
-        index="date",
-        columns="category_of_interest",
-        values="review_stars",
-        aggfunc="mean",
-    )
-    df_resampled = df_pivot.resample("D").mean()
-    df_historical_reviews = df_resampled.rolling(
-        365, min_periods=1, win_type="triang"
-    ).mean()
-
-    return df_business, df_historical_reviews
+    df_business = join_hours_features(df_business, paths["hours_features"])
+    # Derived plot columns are added here, the cached frames are never modified afterwards
+    df_business = add_hour_columns(df_business, weekdays)
+    df_business = add_mercator_columns(df_business)
+    hex_pyramid = HexPyramid(df_business["x"], df_business["y"])
+    day_index = DayIndex(df_business, weekdays)
+
+    # Daily rating totals for the historical chart, precomputed by historical_export if possible
+    if has_rating_history(
+        paths["rating_aggregates"], [paths["business"], paths["reviews"]]
+    ):
+        rating_history = load_rating_history(paths["rating_aggregates"])
+    else:
+        rating_history = business_rating_history(
+            df_business, read_table(paths["reviews"])
+        )
+
+    return df_business, rating_history, hex_pyramid, day_index
 
 
 def update_city(attr, old, new):
     """Callback to update plots when a city is selected."""
+    # Pending slider updates belong to the plots that are about to be replaced
+    scheduler.cancel("sliders")
+    scheduler.cancel("window")
     selected_city = city_selector.value
-    df_business, df_grouped = load_city_data(selected_city)
+    df_business, rating_history, hex_pyramid, day_index = load_city_data(selected_city)
 
     # Update plots
-    scatter_plot, scatter_source, hexbin_plot, historical_plot = setup_plots(
-        df_business, df_grouped, weekdays
+    scatter_plot, day_filters, hexbin_plot, historical_plot, historical_lines = (
+        setup_plots(df_business, rating_history, hex_pyramid, day_index, weekdays)
     )
-    widgets = setup_sliders(df_business, scatter_source, weekdays)
+    widgets = setup_sliders(day_index, day_filters, weekdays)
+    window_widget = setup_window_selector(rating_history, historical_lines)
     layout.children[1] = gridplot(
-        [[widgets, scatter_plot, hexbin_plot], [None, historical_plot]]
+        [[widgets, scatter_plot, hexbin_plot], [window_widget, historical_plot]]
     )
 
 
+# Coalesces bursts of widget events of this session, only the latest state is applied
+scheduler = CallbackScheduler(curdoc())
+
 # Create city selector widget
 city_selector = Select(
     title="Select City",
     value=list(city_files.keys())[0],
     options=list(city_files.keys()),
 )
-city_selector.on_change("value", update_city)
+city_selector.on_change(
+    "value",
+    lambda attr, old, new: scheduler.request("city", update_city, attr, old, new),
+)
 
 
 ####################################
@@ -98,6 +127,11 @@ weekdays = [
     "Saturday",
     "Sunday",
 ]
+# Apply the opening-hours sliders in the browser instead of on the server
+client_side_filtering = os.environ.get("DASH_CLIENT_FILTERING", "0") == "1"
+# Rolling windows of the historical chart in days, the selected one is kept across cities
+rolling_windows = [30, 90, 180, 365, 730]
+rolling_window = 365
 
 
 ####################################
@@ -105,20 +139,21 @@ weekdays = [
 ####################################
 def load_data(file_path):
     # Import data
-    df = pd.read_csv(file_path)
+    df = read_table(file_path)
 
     # Handle NaN values
     return df.dropna(subset=["address"])
 
 
-def process_categories(df, categories):
-    # Create new column containing a specific category of interest
-    df["category_of_interest"] = "Other"
-    for item in categories:
-        df.loc[
-            df["categories"].str.contains(item, na=False), "category_of_interest"
-        ] = item
-    return df
+def join_hours_features(df, file_path):
+    # Join the opening-hour features precomputed by secondary_preprocessing, if present
+    if not (os.path.exists(file_path) or has_columnar_copy(file_path)):
+        return df
+    features = read_table(file_path)
+    features = features[
+        [col for col in features.columns if col == "business_id" or col not in df]
+    ]
+    return df.merge(features, on="business_id", how="left")
 
 
 def filter_hours(df, weekdays):
@@ -138,11 +173,13 @@ def transfer_selected_indices(attr, old, new, source, target):
     target.selected.indices = selected_indices
 
 
-def setup_plots(df_business, df_rolling_reviews, weekdays):
-    scatter_plot, scatter_source = create_scatter_plot(df_business, weekdays)
-    hexbin_plot, hexbin_source = create_hexbin_plot(df_business)
-    historical_plot = create_historical_chart(
-        df_rolling_reviews, categories_of_interest
+def setup_plots(df_business, rating_history, hex_pyramid, day_index, weekdays):
+    scatter_plot, scatter_source, day_filters = create_scatter_plot(
+        df_business, day_index, weekdays, client_side=client_side_filtering
+    )
+    hexbin_plot, hexbin_source = create_hexbin_plot(df_business, hex_pyramid)
+    historical_plot, historical_lines = create_historical_chart(
+        rating_history.rolling(rolling_window), categories_of_interest
     )
 
     scatter_source.selected.on_change(
@@ -158,10 +195,10 @@ def setup_plots(df_business, df_rolling_reviews, weekdays):
         ),
     )
 
-    return scatter_plot, scatter_source, hexbin_plot, historical_plot
+    return scatter_plot, day_filters, hexbin_plot, historical_plot, historical_lines
 
 
-def setup_sliders(df, scatter_source, weekdays):
+def setup_sliders(day_index, day_filters, weekdays):
     # Sliders for selecting number of hours open and hours of opening
     hours_slider = Slider(
         title="Minimum Number of Hours Open", start=0, end=24, value=0, step=0.5
@@ -170,14 +207,21 @@ def setup_sliders(df, scatter_source, weekdays):
         title="Minimum Hours of Opening", start=0, end=24, value=0, step=0.5
     )
 
+    if client_side_filtering:
+        # The thresholds are applied in the browser, no server callbacks needed
+        link_client_filters(day_filters, hours_slider, opening_slider)
+        return column(Spacer(width=50), hours_slider, opening_slider)
+
     hours_slider.on_change(
         "value",
-        lambda attr, old, new: update_plot(
+        lambda attr, old, new: scheduler.request(
+            "sliders",
+            update_plot,
             attr,
             old,
             new,
-            df,
-            scatter_source,
+            day_index,
+            day_filters,
             weekdays,
             hours_slider.value,
             opening_slider.value,
@@ -185,12 +229,14 @@ def setup_sliders(df, scatter_source, weekdays):
     )
     opening_slider.on_change(
         "value",
-        lambda attr, old, new: update_plot(
+        lambda attr, old, new: scheduler.request(
+            "sliders",
+            update_plot,
             attr,
             old,
             new,
-            df,
-            scatter_source,
+            day_index,
+            day_filters,
             weekdays,
             hours_slider.value,
             opening_slider.value,
@@ -200,19 +246,44 @@ def setup_sliders(df, scatter_source, weekdays):
     return column(Spacer(width=50), hours_slider, opening_slider)
 
 
+def update_window(window, rating_history, historical_lines):
+    # Recompute the rolling ratings from the loaded daily totals, no data is reloaded
+    global rolling_window
+    rolling_window = window
+    update_historical_chart(
+        historical_lines, rating_history.rolling(window), categories_of_interest
+    )
+
+
+def setup_window_selector(rating_history, historical_lines):
+    window_selector = Select(
+        title="Rolling Window (days)",
+        value=str(rolling_window),
+        options=[str(window) for window in rolling_windows],
+    )
+    window_selector.on_change(
+        "value",
+        lambda attr, old, new: scheduler.request(
+            "window", update_window, int(new), rating_history, historical_lines
+        ),
+    )
+    return column(Spacer(width=50), window_selector)
+
+
 ####################################
 # Main Script Execution
 ####################################
 def main():
     # Initial setup: load data for the default selected city
     selected_city = city_selector.value
-    df_business, df_historical_reviews = load_city_data(selected_city)
+    df_business, rating_history, hex_pyramid, day_index = load_city_data(selected_city)
 
     # Set up plots and widgets
-    scatter_plot, scatter_source, hexbin_plot, historical_plot = setup_plots(
-        df_business, df_historical_reviews, weekdays
+    scatter_plot, day_filters, hexbin_plot, historical_plot, historical_lines = (
+        setup_plots(df_business, rating_history, hex_pyramid, day_index, weekdays)
     )
-    widgets = setup_sliders(df_business, scatter_source, weekdays)
+    widgets = setup_sliders(day_index, day_filters, weekdays)
+    window_widget = setup_window_selector(rating_history, historical_lines)
 
     # Create the layout with the city selector and plots
     global layout
@@ -225,7 +296,10 @@ def main():
                     scatter_plot,
                     hexbin_plot,
                 ],  # Widgets and plots in the first row
-                [None, historical_plot],  # Historical chart in the second row
+                [
+                    window_widget,
+                    historical_plot,
+                ],  # Window selector and historical chart in the second row
             ]
         ),
     )
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets downsampling of the
+    series (x, y) to n_out points. The first and last points are always kept, and
+    from every bucket in between the point spanning the largest triangle with the
+    previously kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = a = 0
+    for k in range(n_out - 2):
+        lo, hi = edges[k], edges[k + 1]
+        next_lo, next_hi = (hi, edges[k + 2]) if k + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        # Twice the triangle areas, the constant factor does not change the argmax
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[k + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def downsample(y, start, stop, n_out):
+    """
+    Indices of about n_out points of the evenly spaced series y that represent
+    y[start:stop] in a line chart. Runs of NaN are kept as a single NaN each, so
+    the line still breaks where the series has gaps.
+    """
+    y = np.asarray(y, dtype=float)[start:stop]
+    valid = np.flatnonzero(~np.isnan(y))
+    kept = valid[lttb(valid.astype(float), y[valid], n_out)]
+
+    gaps = np.flatnonzero(np.isnan(y))
+    if len(gaps) and len(kept):
+        # One NaN between kept neighbours that have missing values between them
+        first_gap = np.searchsorted(gaps, kept[:-1])
+        has_gap = (first_gap < len(gaps)) & (
+            gaps[np.minimum(first_gap, len(gaps) - 1)] < kept[1:]
+        )
+        kept = np.sort(np.concatenate([kept, gaps[first_gap[has_gap]]]))
+    return start + kept
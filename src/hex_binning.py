@@ -1,28 +1,45 @@
+import numpy as np
 from bokeh.plotting import figure
-from bokeh.models import ColumnDataSource, Circle, ImageURL
+from bokeh.models import ColumnDataSource, Circle, ImageURL, LinearColorMapper
 from pyproj import Transformer, CRS
 import xyzservices.providers as xyz
 from bokeh.core.properties import value
+from hex_pyramid import attach_hex_pyramid
+from sources import compact_data
 
 
-def create_hexbin_plot(df):
+# Built once per process, creating a Transformer is far more expensive than using it
+transformer = Transformer.from_crs(
+    CRS.from_epsg(4326),  # WGS84
+    CRS.from_epsg(3857),  # Web Mercator
+    always_xy=True,
+)
+
+
+def to_web_mercator(longitude, latitude):
+    # Project whole arrays of coordinates in a single call
+    return transformer.transform(np.asarray(longitude), np.asarray(latitude))
+
+
+def add_mercator_columns(df):
+    # Calculate web mercator coordinates, unless they were precomputed
+    if "x" in df.columns and "y" in df.columns:
+        return df
+    df = df.copy()
+    df["x"], df["y"] = to_web_mercator(df["longitude"], df["latitude"])
+    return df
+
+
+def create_hexbin_plot(df, pyramid):
     # Load data and extract relevant columns
     # df = df[["name", "latitude", "longitude"]].copy()
 
-    # Calculate web mercator coordinates
-    in_proj = CRS.from_epsg(4326)  # WGS84
-    out_proj = CRS.from_epsg(3857)  # Web Mercator
-    transformer = Transformer.from_crs(in_proj, out_proj, always_xy=True)
-    df["x"], df["y"] = zip(
-        *df.apply(
-            lambda row: transformer.transform(row["longitude"], row["latitude"]), axis=1
-        )
-    )
+    # Web mercator coordinates are expected in the "x" and "y" columns
     min_x, max_x = df["x"].min(), df["x"].max()
     min_y, max_y = df["y"].min(), df["y"].max()
 
-    # Create plot
-    source = ColumnDataSource(df)
+    # Create plot, the circles only need the projected coordinates
+    source = ColumnDataSource(compact_data(df, ["x", "y"]))
     p = figure(
         title="Restaurants in Philadelphia",
         x_axis_type="mercator",
@@ -37,10 +54,19 @@ def create_hexbin_plot(df):
     p.grid.visible = False
     p.axis.visible = False
 
-    p.hexbin(
-        df["x"], df["y"], size=500, line_color=None, fill_alpha=0.5, syncable=False
+    # Hex tiles are aggregated on the server, at a size that fits the current zoom
+    color_mapper = LinearColorMapper(palette="Viridis256", low=0)
+    hex_renderer = p.hex_tile(
+        q="q",
+        r="r",
+        size=pyramid.sizes[0],
+        source=ColumnDataSource(data=dict(q=[], r=[], counts=[])),
+        line_color=None,
+        fill_color={"field": "counts", "transform": color_mapper},
+        fill_alpha=0.5,
     )
-    
+    attach_hex_pyramid(p, hex_renderer, color_mapper, pyramid)
+
     circle_renderer = p.circle(
         x="x",
         y="y",
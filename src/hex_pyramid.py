@@ -0,0 +1,84 @@
+import numpy as np
+from bokeh.events import RangesUpdate
+from bokeh.util.hex import axial_to_cartesian, cartesian_to_axial
+
+# Hex sizes in web mercator meters, doubling from block level to city level
+HEX_SIZES = tuple(125 * 2**level for level in range(8))
+
+# Preferred on-screen size of a hex in pixels
+TARGET_HEX_PIXELS = 12
+
+
+class HexPyramid:
+    """
+    Hex bin counts of a set of points precomputed at several bin sizes. The map
+    only gets the cells of the level that suits the current zoom, and only those
+    inside the visible range.
+    """
+
+    def __init__(self, x, y, sizes=HEX_SIZES):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.sizes = tuple(sizes)
+        self.levels = {}
+        for size in self.sizes:
+            q, r = cartesian_to_axial(x, y, size, "pointytop")
+            # Count the points per (q, r) cell
+            cells, counts = np.unique(
+                np.column_stack([q, r]), axis=0, return_counts=True
+            )
+            cx, cy = axial_to_cartesian(cells[:, 0], cells[:, 1], size, "pointytop")
+            self.levels[size] = dict(
+                q=cells[:, 0].astype(np.int32),
+                r=cells[:, 1].astype(np.int32),
+                counts=counts.astype(np.int32),
+                cx=cx,
+                cy=cy,
+            )
+
+    @property
+    def nbytes(self):
+        return sum(
+            array.nbytes for level in self.levels.values() for array in level.values()
+        )
+
+    def size_for(self, x_extent, plot_width):
+        # Level whose hexes come closest to TARGET_HEX_PIXELS on screen
+        pixels = np.array(self.sizes) * plot_width / max(x_extent, 1e-9)
+        return self.sizes[int(np.argmin(np.abs(np.log(pixels / TARGET_HEX_PIXELS))))]
+
+    def visible_cells(self, size, x0, x1, y0, y1):
+        level = self.levels[size]
+        # Keep cells whose hexagon may overlap the range, not only their centers
+        inside = (
+            (level["cx"] >= x0 - size)
+            & (level["cx"] <= x1 + size)
+            & (level["cy"] >= y0 - size)
+            & (level["cy"] <= y1 + size)
+        )
+        return dict(
+            q=level["q"][inside], r=level["r"][inside], counts=level["counts"][inside]
+        )
+
+    def max_count(self, size):
+        counts = self.levels[size]["counts"]
+        return int(counts.max()) if len(counts) else 1
+
+
+def attach_hex_pyramid(plot, renderer, color_mapper, pyramid):
+    """Keep the hex renderer of plot showing the pyramid level that fits the current zoom."""
+    source = renderer.data_source
+
+    def show_range(x0, x1, y0, y1):
+        size = pyramid.size_for(x1 - x0, plot.width)
+        renderer.glyph.size = size
+        color_mapper.high = pyramid.max_count(size)
+        source.data = pyramid.visible_cells(size, x0, x1, y0, y1)
+
+    def on_ranges_update(event):
+        show_range(event.x0, event.x1, event.y0, event.y1)
+
+    plot.on_event(RangesUpdate, on_ranges_update)
+    show_range(
+        plot.x_range.start, plot.x_range.end, plot.y_range.start, plot.y_range.end
+    )
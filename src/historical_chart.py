@@ -1,10 +1,52 @@
+import numpy as np
 from bokeh.plotting import figure
 from bokeh.palettes import Colorblind
+from bokeh.events import RangesUpdate
+from bokeh.models import ColumnDataSource, Range1d
+from downsampling import downsample
+
+
+def chart_frame(df, categories_of_interest):
+    df = df[df.index.year > 2008]
+    return df[[category for category in categories_of_interest if category in df]]
+
+
+class DownsampledLines:
+    """
+    Lines of a datetime chart that only hold an LTTB-downsampled copy of the visible
+    part of their series, about one point per pixel of the plot width. The daily
+    series stay on the server, and zooming in resamples the new x-range at a higher
+    resolution.
+    """
+
+    def __init__(self, plot, sources, df):
+        self.plot = plot
+        self.sources = sources
+        self.viewport = (None, None)
+        self.set_series(df)
+        plot.on_event(RangesUpdate, lambda event: self.show_range(event.x0, event.x1))
+
+    def set_series(self, df):
+        self.df = df
+        # Milliseconds since the epoch, like the x-range of a datetime axis
+        self.x = df.index.values.astype("datetime64[ms]").astype(np.int64)
+        self.show_range(*self.viewport)
+
+    def show_range(self, x0, x1):
+        self.viewport = (x0, x1)
+        # One point beyond each side, so the lines run up to the edges of the plot
+        start = 0 if x0 is None else max(int(np.searchsorted(self.x, x0)) - 1, 0)
+        stop = None if x1 is None else int(np.searchsorted(self.x, x1, "right")) + 1
+        stop = len(self.x) if stop is None else min(stop, len(self.x))
+        for category, source in self.sources.items():
+            ratings = self.df[category].to_numpy(np.float32)
+            rows = downsample(ratings, start, stop, self.plot.width or 600)
+            source.data = dict(date=self.df.index.values[rows], rating=ratings[rows])
 
 
 def create_historical_chart(df, categories_of_interest):
 
-    df = df[df.index.year > 2008]
+    df = chart_frame(df, categories_of_interest)
 
     # create a new plot with a title and axis labels
     p = figure(
@@ -13,16 +55,22 @@ def create_historical_chart(df, categories_of_interest):
         y_axis_label="Average Rating",
         x_axis_type="datetime",
     )
+    # Fixed to the whole series, the lines only hold the points of the visible range
+    if len(df):
+        p.x_range = Range1d(df.index[0], df.index[-1])
 
     # Get a list of color-blind friendly colors of length = len(categories_of_interest)
     colors = Colorblind[len(categories_of_interest)]
 
     # Make a line for each category
+    sources = {}
     for i, category in enumerate(categories_of_interest):
         if category in df.columns:
+            sources[category] = ColumnDataSource(data=dict(date=[], rating=[]))
             p.line(
-                df.index,
-                df[category],
+                "date",
+                "rating",
+                source=sources[category],
                 legend_label=category,
                 color=colors[i],
                 line_width=2,
@@ -34,4 +82,9 @@ def create_historical_chart(df, categories_of_interest):
     # Hide line when clicked on its legend item
     p.legend.click_policy = "hide"
 
-    return p
+    return p, DownsampledLines(p, sources, df)
+
+
+def update_historical_chart(lines, df, categories_of_interest):
+    # Swap in the series of another rolling window, keeping the current viewport
+    lines.set_series(chart_frame(df, categories_of_interest))
@@ -0,0 +1,245 @@
+import numpy as np
+import pandas as pd
+
+# Minute of day stored for days without opening hours
+CLOSED_MINUTE = -1
+
+WEEKDAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def split_hours(values):
+    """
+    The four numbers of each "H:M-H:M" value (with one or two digits each) as an int16
+    array, and a mask of the values in that format. The values are read as bytes, one
+    number of all values at a time.
+    """
+    present = pd.notna(values)
+    # Values in the format have at most 11 characters, longer ones keep a 12th byte
+    chars = np.where(present, values, "").astype("S12").view(np.uint8)
+    chars = chars.astype(np.int16) - ord("0")
+    starts = np.arange(len(values)) * 12
+    # Separator after each number (the end of the value after the last), offset like the digits
+    separators = np.array([ord(":"), ord("-"), ord(":"), 0]) - ord("0")
+
+    numbers = np.zeros((len(values), 4), dtype=np.int16)
+    valid = present
+    position = np.zeros(len(values), dtype=np.intp)
+    for k, separator in enumerate(separators):
+        first = chars[starts + position]
+        second = chars[starts + np.minimum(position + 1, 11)]
+        two_digits = (second >= 0) & (second <= 9)
+        numbers[:, k] = np.where(two_digits, first * 10 + second, first)
+        position = np.minimum(position + 1 + two_digits, 11)
+        valid = (
+            valid
+            & (first >= 0)
+            & (first <= 9)
+            & (chars[starts + position] == separator)
+        )
+        position = np.minimum(position + 1, 11)
+    return numbers, valid
+
+
+def normalize_hours(hours):
+    """
+    Normalize a column of opening hours like "8:0-22:0" to zero-padded "08:00-22:00"
+    strings, with the minute of day of opening and closing as int16 arrays. Missing
+    hours and "0:0-0:0" become "Closed" with CLOSED_MINUTE, values in no such format
+    are kept as they are with CLOSED_MINUTE. Other spellings of midnight to midnight,
+    like "00:00-00:00", stay open for 24 hours.
+    """
+    hours = pd.Series(hours, copy=False)
+    values = hours.to_numpy(dtype=object)
+    numbers, matched = split_hours(values)
+
+    opening = numbers[:, 0] * 60 + numbers[:, 1]
+    closing = numbers[:, 2] * 60 + numbers[:, 3]
+    # Only the exact "0:0-0:0" of the raw data marks a closed day
+    open_days = matched & (values != "0:0-0:0")
+    opening[~open_days] = CLOSED_MINUTE
+    closing[~open_days] = CLOSED_MINUTE
+
+    normalized = np.where(pd.notna(values), values, "Closed")
+    normalized[values == "0:0-0:0"] = "Closed"
+    # The zero-padded strings are written as bytes, two digits per number
+    padded = np.empty((np.count_nonzero(open_days), 11), dtype=np.uint8)
+    padded[:, [0, 3, 6, 9]] = numbers[open_days] // 10 + ord("0")
+    padded[:, [1, 4, 7, 10]] = numbers[open_days] % 10 + ord("0")
+    padded[:, [2, 8]] = ord(":")
+    padded[:, 5] = ord("-")
+    normalized[open_days] = padded.view("S11").ravel().astype(str)
+    return pd.Series(normalized, index=hours.index), opening, closing
+
+
+def hours_from_minutes(opening_minute, closing_minute):
+    """
+    Hour of opening, hour of closing and open duration in hours as floats, from the
+    minute of day of opening and closing. Intervals that end at or before their start
+    are taken to cross midnight. CLOSED_MINUTE or NaN gives NaN.
+    """
+    opening = np.asarray(opening_minute, dtype=float) / 60.0
+    closing = np.asarray(closing_minute, dtype=float) / 60.0
+    closed = (opening < 0) | (closing < 0)
+    opening[closed] = np.nan
+    closing[closed] = np.nan
+    duration = closing - opening
+    duration[duration <= 0] += 24.0
+    return opening, closing, duration
+
+
+def parse_hours(hours):
+    """
+    Parse a column of "HH:MM-HH:MM" opening hours into float arrays of the hour of
+    opening, the hour of closing and the open duration in hours. Intervals that end
+    at or before their start are taken to cross midnight. "Closed" or missing hours
+    give NaN.
+    """
+    values = pd.Series(hours, copy=False).to_numpy(dtype=object)
+    present = pd.notna(values)
+    numbers = np.full((len(values), 4), np.nan)
+
+    # Zero-padded values (as written by secondary_preprocessing) are decoded from
+    # their bytes directly: "HH:MM-HH:MM" is 11 characters with fixed separators
+    chars = np.where(present, values, "").astype("S12").view(np.uint8)
+    chars = chars.reshape(len(values), 12)
+    digits = chars[:, [0, 1, 3, 4, 6, 7, 9, 10]].astype(np.int16) - ord("0")
+    padded = (
+        (chars[:, 2] == ord(":"))
+        & (chars[:, 5] == ord("-"))
+        & (chars[:, 8] == ord(":"))
+        & (chars[:, 11] == 0)
+        & ((digits >= 0) & (digits <= 9)).all(axis=1)
+    )
+    numbers[padded] = digits[padded, 0::2] * 10 + digits[padded, 1::2]
+
+    # Anything else that is not "Closed" (e.g. "8:0-22:0" in the raw data) is split
+    unpadded = present & ~padded & (values != "Closed")
+    if unpadded.any():
+        parts = pd.Series(values[unpadded]).str.split(r"[-:]", n=3, expand=True)
+        if parts.shape[1] == 4:
+            numbers[unpadded] = parts.apply(pd.to_numeric, errors="coerce").to_numpy(
+                float
+            )
+
+    return hours_from_minutes(
+        numbers[:, 0] * 60 + numbers[:, 1], numbers[:, 2] * 60 + numbers[:, 3]
+    )
+
+
+def hours_features(df_business, weekdays=WEEKDAYS):
+    """
+    Opening-hour features of each business keyed by business_id: the hour of opening,
+    the hour of closing and the open duration of each day as floats, and the weekly
+    open hours, for which closed days count as zero hours. They are computed from the
+    minute-of-day columns of secondary_preprocessing where there are any.
+    """
+    features = pd.DataFrame({"business_id": df_business["business_id"]})
+    durations = []
+    for day in weekdays:
+        if day + "_Minute_Of_Opening" in df_business.columns:
+            opening, closing, duration = hours_from_minutes(
+                df_business[day + "_Minute_Of_Opening"],
+                df_business[day + "_Minute_Of_Closing"],
+            )
+        else:
+            opening, closing, duration = parse_hours(df_business["hours_" + day])
+        features[day + "_Hour_Of_Opening_Float"] = opening
+        features[day + "_Hour_Of_Closing_Float"] = closing
+        features[day + "_Open_Duration_Float"] = duration
+        durations.append(duration)
+    features["Weekly_Open_Hours"] = np.nansum(np.column_stack(durations), axis=1)
+    return features
+
+
+def add_hour_columns(df_business, weekdays):
+    # Process hours of operation for each day, unless they were precomputed
+    df_business = df_business.copy()
+    days = [
+        day
+        for day in weekdays
+        if day + "_Hour_Of_Opening_Float" not in df_business.columns
+    ]
+    if days:
+        features = hours_features(df_business, days)
+        for day in days:
+            for column in (
+                day + "_Hour_Of_Opening_Float",
+                day + "_Open_Duration_Float",
+            ):
+                df_business[column] = features[column].to_numpy()
+    return df_business
+
+
+if __name__ == "__main__":
+    # Benchmark against the per-row parsing that scatter.py used before
+    import timeit
+    from datetime import datetime
+
+    def get_opening_float(time_interval):
+        opening_time = time_interval.split("-")
+        opening_hour, opening_minute = opening_time[0].split(":")
+        opening_time_float = float(opening_hour) + float(opening_minute) / 60.0
+        return opening_time_float
+
+    def get_open_duration_float(time_interval):
+        start_time_str, end_time_str = time_interval.split("-")
+        start_time = datetime.strptime(start_time_str, "%H:%M")
+        end_time = datetime.strptime(end_time_str, "%H:%M")
+        time_difference = end_time - start_time
+        hours = time_difference.total_seconds() / 3600
+        return abs(hours)
+
+    rng = np.random.default_rng(0)
+    n = 100_000
+    opening_minutes = rng.integers(0, 24 * 60, n)
+    closing_minutes = rng.integers(0, 24 * 60, n)
+    hours = pd.Series(
+        [
+            f"{o // 60:02d}:{o % 60:02d}-{c // 60:02d}:{c % 60:02d}"
+            for o, c in zip(opening_minutes, closing_minutes)
+        ]
+    )
+    # The raw (not zero-padded) format goes through the slower splitting path
+    raw_hours = pd.Series(
+        [
+            f"{o // 60}:{o % 60}-{c // 60}:{c % 60}"
+            for o, c in zip(opening_minutes, closing_minutes)
+        ]
+    )
+
+    opening, _, duration = parse_hours(hours)
+    assert np.allclose(
+        np.column_stack(parse_hours(raw_hours)), np.column_stack(parse_hours(hours))
+    )
+    assert np.allclose(opening, hours.apply(get_opening_float))
+    # The per-row version returns abs(end - start) and does not wrap past midnight
+    wraps = closing_minutes <= opening_minutes
+    assert np.allclose(duration[~wraps], hours[~wraps].apply(get_open_duration_float))
+    assert np.allclose(
+        duration[wraps], 24 - hours[wraps].apply(get_open_duration_float)
+    )
+
+    per_row = timeit.timeit(
+        lambda: (
+            hours.apply(get_opening_float),
+            hours.apply(get_open_duration_float),
+        ),
+        number=3,
+    )
+    vectorized = timeit.timeit(lambda: parse_hours(hours), number=3)
+    vectorized_raw = timeit.timeit(lambda: parse_hours(raw_hours), number=3)
+    print(f"per-row:          {per_row / 3 * 1000:8.1f} ms per {n} values")
+    print(
+        f"vectorized:       {vectorized / 3 * 1000:8.1f} ms ({per_row / vectorized:.0f}x)"
+    )
+    print(
+        f"vectorized (raw): {vectorized_raw / 3 * 1000:8.1f} ms ({per_row / vectorized_raw:.0f}x)"
+    )
@@ -0,0 +1,170 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Default window of the rolling average rating in days
+ROLLING_WINDOW = 365
+
+
+def daily_rating_totals(dates, stars, categories):
+    """
+    Sum and count the review stars per category and day in one pass. Returns the
+    first day, the category names and two (categories x days) arrays covering every
+    day from the first to the last review, with zeros on days without reviews.
+    Without reviews the arrays cover no days, for all the given categories.
+    """
+    days = pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[D]")
+    categories = pd.Categorical(categories)
+    if len(days) == 0:
+        # Any start will do for an empty history, NaT cannot be turned into a date range
+        names = np.asarray(categories.categories, dtype=str)
+        empty = np.zeros((len(names), 0))
+        return np.datetime64("1970-01-01", "D"), names, empty, empty.astype(np.int64)
+    categories = categories.remove_unused_categories()
+    names = np.asarray(categories.categories, dtype=str)
+    start = days.min()
+    day_numbers = (days - start).astype(np.int64)
+    n_days = int(day_numbers.max()) + 1
+
+    # One bin per (category, day) cell
+    cells = categories.codes.astype(np.int64) * n_days + day_numbers
+    size = len(names) * n_days
+    sums = np.bincount(cells, weights=np.asarray(stars, dtype=float), minlength=size)
+    counts = np.bincount(cells, minlength=size)
+    return start, names, sums.reshape(-1, n_days), counts.reshape(-1, n_days)
+
+
+def cumulative(values):
+    # Running totals along the days, with a leading zero column
+    return np.pad(np.cumsum(values, axis=1), ((0, 0), (1, 0)))
+
+
+def box_sum(cumulative_values, width):
+    # Trailing sums over the last width days (fewer at the start) from running totals
+    upper = cumulative_values[:, 1:]
+    lower = np.pad(cumulative_values, ((0, 0), (width - 1, 0)), mode="edge")
+    return upper - lower[:, : upper.shape[1]]
+
+
+class RatingHistory:
+    """
+    Daily review star sums and counts per category. Rolling average ratings for any
+    window are computed from their running totals in O(days), and are weighted by
+    review: a day with 300 reviews counts 300 times as much as a day with one.
+    """
+
+    def __init__(self, start, categories, sums, counts):
+        self.start = np.datetime64(start, "D")
+        self.categories = np.asarray(categories, dtype=str)
+        self.sums = np.asarray(sums, dtype=float)
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.cumulative_sums = cumulative(self.sums)
+        self.cumulative_counts = cumulative(self.counts.astype(float))
+        self.days = pd.date_range(
+            pd.Timestamp(self.start.item()), periods=self.sums.shape[1], freq="D"
+        )
+
+    @property
+    def nbytes(self):
+        return (
+            self.sums.nbytes
+            + self.counts.nbytes
+            + self.cumulative_sums.nbytes
+            + self.cumulative_counts.nbytes
+        )
+
+    def window_totals(self, window, kernel):
+        if not isinstance(kernel, str):
+            # Custom weights, kernel[0] applying to the current day: O(days * len(kernel))
+            kernel = np.asarray(kernel, dtype=float)
+            n_days = self.sums.shape[1]
+            if n_days == 0:
+                # np.convolve rejects empty rows
+                return self.sums, self.counts
+            return tuple(
+                np.array([np.convolve(row, kernel)[:n_days] for row in values])
+                for values in (self.sums, self.counts)
+            )
+        if kernel == "box":
+            return (
+                box_sum(self.cumulative_sums, window),
+                box_sum(self.cumulative_counts, window),
+            )
+        if kernel == "triangular":
+            # Two boxes of half the width add up to a triangle spanning the window, like
+            # scipy's triang. For even windows its weights 1, 3, ..., 3, 1 take a third
+            # box of two days.
+            half = (window + 1) // 2
+            sums, counts = self.window_totals(half, "box")
+            widths = [half] if window % 2 else [half, 2]
+            for width in widths:
+                sums = box_sum(cumulative(sums), width)
+                counts = box_sum(cumulative(counts), width)
+            return sums, counts
+        raise ValueError(
+            "Unsupported kernel. Use 'box', 'triangular' or an array of weights."
+        )
+
+    def rolling(self, window=ROLLING_WINDOW, kernel="triangular"):
+        """
+        Rolling average rating per category as a DataFrame indexed by day. kernel is
+        "box", "triangular" or an array of weights for the current and past days.
+        Windows without reviews are NaN.
+        """
+        sums, counts = self.window_totals(window, kernel)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        return pd.DataFrame(means.T, index=self.days, columns=pd.Index(self.categories))
+
+
+def business_rating_history(df_business, df_review):
+    """Rating history per category of interest, from the reviews of the given businesses."""
+    # Row of each review's business, -1 for reviews of other businesses
+    businesses = df_business.drop_duplicates("business_id")
+    rows = pd.Index(businesses["business_id"]).get_indexer(df_review["business_id"])
+    matched = rows >= 0
+
+    # Gather the category code of each review's business, no joined frame is built
+    categories = pd.Categorical(businesses["category_of_interest"])
+    review_categories = pd.Categorical.from_codes(
+        categories.codes[rows[matched]], categories.categories
+    )
+    return RatingHistory(
+        *daily_rating_totals(
+            df_review["date"].to_numpy()[matched],
+            df_review["stars"].to_numpy()[matched],
+            review_categories,
+        )
+    )
+
+
+def save_rating_history(path, history):
+    np.savez(
+        path,
+        start=history.start,
+        categories=history.categories,
+        sums=history.sums,
+        counts=history.counts,
+    )
+
+
+def has_rating_history(path, source_paths):
+    # Ignore aggregates that are older than any of the files they were computed from
+    if not os.path.exists(path):
+        return False
+    return all(
+        os.path.getmtime(path) >= os.path.getmtime(source)
+        for source in source_paths
+        if os.path.exists(source)
+    )
+
+
+def load_rating_history(path):
+    """Rating history as stored by save_rating_history."""
+    with np.load(path) as aggregates:
+        return RatingHistory(
+            aggregates["start"],
+            aggregates["categories"],
+            aggregates["sums"],
+            aggregates["counts"],
+        )
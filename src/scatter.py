@@ -1,39 +1,66 @@
+import numpy as np
 import pandas as pd
 from bokeh.plotting import figure
-from bokeh.models import ColumnDataSource
+from bokeh.models import ColumnDataSource, CDSView, IndexFilter, CustomJS
+from bokeh.models.filters import CustomJSFilter
 from bokeh.palettes import Colorblind
-from datetime import datetime
+from sources import compact_data
 
 
-def get_opening_float(time_interval):
-    opening_time = time_interval.split("-")
-    opening_hour, opening_minute = opening_time[0].split(":")
-    opening_time_float = float(opening_hour) + float(opening_minute) / 60.0
-    return opening_time_float
+def scatter_columns(weekdays):
+    columns = []
+    for day in weekdays:
+        columns += [day + "_Hour_Of_Opening_Float", day + "_Open_Duration_Float"]
+    return columns
 
 
-def get_open_duration_float(time_interval):
-    start_time_str, end_time_str = time_interval.split("-")
-    start_time = datetime.strptime(start_time_str, "%H:%M")
-    end_time = datetime.strptime(end_time_str, "%H:%M")
-    time_difference = end_time - start_time
-    hours = time_difference.total_seconds() / 3600
-    return abs(hours)
+class DayIndex:
+    """
+    Per-day row indexes sorted by open duration, so the rows passing the slider
+    thresholds are found with a binary search instead of a scan of the frame.
+    Rows of days a business is closed on are left out.
+    """
 
+    def __init__(self, df_business, weekdays):
+        self.days = {}
+        for day in weekdays:
+            opening = df_business[day + "_Hour_Of_Opening_Float"].to_numpy(float)
+            duration = df_business[day + "_Open_Duration_Float"].to_numpy(float)
+            rows = np.flatnonzero(~np.isnan(opening) & ~np.isnan(duration))
+            rows = rows[np.argsort(duration[rows], kind="stable")]
+            self.days[day] = (rows.astype(np.int32), duration[rows], opening[rows])
 
-def create_scatter_plot(df_business, weekdays):
-    # Process hours of operation for each day
-    for day in weekdays:
-        df_business[day + "_Hour_Of_Opening_Float"] = df_business["hours_" + day].apply(
-            get_opening_float
-        )
-        df_business[day + "_Open_Duration_Float"] = df_business["hours_" + day].apply(
-            get_open_duration_float
-        )
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for arrays in self.days.values() for array in arrays)
+
+    def rows(self, day, min_hours, min_opening):
+        rows, durations, openings = self.days[day]
+        start = np.searchsorted(durations, min_hours, side="left")
+        return np.sort(rows[start:][openings[start:] >= min_opening])
+
+
+# Browser-side version of DayIndex.rows, run over the float32 arrays of the source.
+# NaN (closed days) fails both comparisons and is left out as well.
+CLIENT_FILTER_CODE = """
+const opening = source.data[opening_column]
+const duration = source.data[duration_column]
+const min_hours = hours_slider.value
+const min_opening = opening_slider.value
+const indices = []
+for (let i = 0; i < opening.length; i++) {
+    if (duration[i] >= min_hours && opening[i] >= min_opening) {
+        indices.push(i)
+    }
+}
+return indices
+"""
 
-    # Set up Bokeh plot
+
+def create_scatter_plot(df_business, day_index, weekdays, client_side=False):
+    # Set up Bokeh plot, sending only the columns the glyphs read
     #source = ColumnDataSource(data=dict(x=[], y=[], color=[], day=[]))
-    source = ColumnDataSource(df_business)
+    source = ColumnDataSource(compact_data(df_business, scatter_columns(weekdays)))
 
     plot = figure(
         title="Opening Hours of Businesses",
@@ -43,13 +70,27 @@ def create_scatter_plot(df_business, weekdays):
         tools="wheel_zoom,pan,reset,box_select,lasso_select",
     )
 
+    # Each day is drawn through its own filter, which the sliders update
+    day_filters = {}
     colors = Colorblind[len(weekdays)]
     for i, day in enumerate(weekdays):
         #filtered_df = df_business[df_business[day + "_Open_Duration_Float"].notna()]
+        if client_side:
+            # Sliders are added to the args by link_client_filters
+            day_filters[day] = CustomJSFilter(
+                args=dict(
+                    opening_column=day + "_Hour_Of_Opening_Float",
+                    duration_column=day + "_Open_Duration_Float",
+                ),
+                code=CLIENT_FILTER_CODE,
+            )
+        else:
+            day_filters[day] = IndexFilter(indices=day_index.rows(day, 0, 0))
         plot.scatter(
             x=day + "_Hour_Of_Opening_Float",
             y=day + "_Open_Duration_Float",
             source=source,
+            view=CDSView(filter=day_filters[day]),
             color=colors[i],
             size=7,
             alpha=0.3,
@@ -60,19 +101,28 @@ def create_scatter_plot(df_business, weekdays):
     plot.legend.click_policy = "hide"
     plot.add_layout(plot.legend[0], "right")
 
-    return plot, source
+    return plot, source, day_filters
 
 
-def update_plot(attr, old, new, df_business, source, weekdays, min_hours, min_opening):
-    new_data = {"x": [], "y": [], "color": [], "day": []}
-    colors = Colorblind[len(weekdays)]
-    for i, day in enumerate(weekdays):
-        filtered_df = df_business[
-            (df_business[day + "_Open_Duration_Float"] >= min_hours)
-            & (df_business[day + "_Hour_Of_Opening_Float"] >= min_opening)
-        ]
-        new_data["x"].extend(filtered_df[day + "_Hour_Of_Opening_Float"].tolist())
-        new_data["y"].extend(filtered_df[day + "_Open_Duration_Float"].tolist())
-        new_data["color"].extend([colors[i]] * len(filtered_df))
-        new_data["day"].extend([day] * len(filtered_df))
-    source.data = new_data
+def update_plot(
+    attr, old, new, day_index, day_filters, weekdays, min_hours, min_opening
+):
+    # Only the indices of days whose visible rows changed are sent to the browser,
+    # the data in the source stays as it is
+    for day in weekdays:
+        indices = day_index.rows(day, min_hours, min_opening)
+        if not np.array_equal(indices, day_filters[day].indices):
+            day_filters[day].indices = indices
+
+
+def link_client_filters(day_filters, hours_slider, opening_slider):
+    # Re-run the CustomJSFilters in the browser when a slider moves. Emitting the
+    # change signal only recomputes the views locally, nothing is sent back
+    for day_filter in day_filters.values():
+        day_filter.args.update(hours_slider=hours_slider, opening_slider=opening_slider)
+    recompute = CustomJS(
+        args=dict(filters=list(day_filters.values())),
+        code="for (const filter of filters) { filter.change.emit() }",
+    )
+    hours_slider.js_on_change("value", recompute)
+    opening_slider.js_on_change("value", recompute)
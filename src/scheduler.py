@@ -0,0 +1,62 @@
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class CallbackScheduler:
+    """
+    Coalesces bursts of widget events of one session. Every request replaces the
+    pending work under the same key, and only the latest request runs, once no new
+    request for that key arrived for delay_ms. Replaced and cancelled requests are
+    counted in skipped.
+    """
+
+    def __init__(self, doc, delay_ms=150):
+        self.doc = doc
+        self.delay_ms = delay_ms
+        self.pending = {}
+        self.timeouts = {}
+        self.executed = 0
+        self.skipped = 0
+
+    def request(self, key, callback, *args):
+        if key in self.pending:
+            self.skipped += 1
+        self.pending[key] = (callback, args, time.monotonic() + self.delay_ms / 1000)
+        if key not in self.timeouts:
+            self.schedule(key, self.delay_ms)
+
+    def schedule(self, key, delay_ms):
+        self.timeouts[key] = self.doc.add_timeout_callback(
+            lambda: self.run(key), delay_ms
+        )
+
+    def run(self, key):
+        del self.timeouts[key]
+        if key not in self.pending:
+            return
+        callback, args, deadline = self.pending[key]
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            # The burst is still going on, wait for the latest request to settle
+            self.schedule(key, remaining * 1000)
+            return
+        del self.pending[key]
+        self.executed += 1
+        log.debug(
+            "Running %r, %d callbacks run and %d skipped in this session",
+            key,
+            self.executed,
+            self.skipped,
+        )
+        callback(*args)
+
+    def cancel(self, key):
+        # Drop pending work that no longer applies, e.g. slider updates of a
+        # city that is being replaced
+        if self.pending.pop(key, None) is not None:
+            self.skipped += 1
+        timeout = self.timeouts.pop(key, None)
+        if timeout is not None:
+            self.doc.remove_timeout_callback(timeout)
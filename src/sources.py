@@ -0,0 +1,21 @@
+import numpy as np
+
+
+def compact_data(df, columns):
+    """
+    Build ColumnDataSource data holding only the given columns of df, as compact
+    NumPy arrays. Floats are sent as float32 and integers as int32, which Bokeh
+    transfers to the browser as binary buffers instead of JSON lists.
+    """
+    data = {}
+    for col in columns:
+        values = df[col].to_numpy()
+        if values.dtype.kind == "f":
+            values = values.astype(np.float32)
+        elif values.dtype.kind in "iu" and (
+            len(values) == 0
+            or np.iinfo(np.int32).min <= values.min() <= values.max() < 2**31
+        ):
+            values = values.astype(np.int32)
+        data[col] = values
+    return data